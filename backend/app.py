@@ -1,21 +1,73 @@
 from __future__ import annotations
 
+import signal
+import threading
 from pathlib import Path
 
+import click
 from flask import Flask, jsonify
 from flask_cors import CORS
 
 from .auth import bp as auth_bp
 from .charts import bp as charts_bp
 from .config import get_config
+from . import compaction, database, metrics, migrations
 from .extensions import db, jwt
-from .models import CodeTemplate
-from .tasks import worker
+from .models import ChartTaskResult, CodeTemplate
+from .profiling import profiler
+from .search import search_index
+from .tasks import WORKER_MODES, queue_backend, worker
+from .utils.request_limits import LimitedRequest
 
 from dotenv import load_dotenv
-def create_app(config_name: str | None = None) -> Flask:
+
+DEFAULT_TEMPLATE_CONTENT = (
+    "// ACT 默认模板\n"
+    "// 标题：{title}\n"
+    "// 摘要：{summary}\n"
+    "// 数据点：{data_points}\n"
+    "// 表格数据：{table_data}\n"
+)
+
+
+def seed_system_templates() -> int:
+    """写入内置的 Java / Kotlin 模板（已存在系统模板时跳过），返回新增数量。"""
+    if CodeTemplate.query.filter_by(is_system=True).count():
+        return 0
+    templates = [
+        CodeTemplate(
+            name="默认模板 (Java)",
+            language="java",
+            content=DEFAULT_TEMPLATE_CONTENT,
+            is_system=True,
+        ),
+        CodeTemplate(
+            name="默认模板 (Kotlin)",
+            language="kotlin",
+            content=DEFAULT_TEMPLATE_CONTENT,
+            is_system=True,
+        ),
+    ]
+    db.session.add_all(templates)
+    db.session.commit()
+    return len(templates)
+
+
+def init_database(app: Flask) -> int:
+    """建表、创建全文索引并写入系统模板，可重复执行。"""
+    with app.app_context():
+        db.create_all()
+        seeded = seed_system_templates()
+    search_index.create_schema(app)
+    return seeded
+
+
+def create_app(config_name: str | None = None, config_overrides: dict | None = None) -> Flask:
     app = Flask(__name__)
+    app.request_class = LimitedRequest
     app.config.from_object(get_config(config_name))
+    if config_overrides:
+        app.config.update(config_overrides)
     load_dotenv()
 
     upload_dir = Path(app.config["UPLOAD_FOLDER"])
@@ -23,47 +75,134 @@ def create_app(config_name: str | None = None) -> Flask:
 
     CORS(app, resources={r"/api/*": {"origins": "*"}})
 
+    database.configure_engines(app)
     db.init_app(app)
+    database.init_app(app)
     jwt.init_app(app)
 
-    with app.app_context():
-        db.create_all()
-        if CodeTemplate.query.filter_by(is_system=True).count() == 0:
-            default_content = (
-                "// ACT 默认模板\n"
-                "// 标题：{title}\n"
-                "// 摘要：{summary}\n"
-                "// 数据点：{data_points}\n"
-                "// 表格数据：{table_data}\n"
-            )
-            java_template = CodeTemplate(
-                name="默认模板 (Java)",
-                language="java",
-                content=default_content,
-                is_system=True,
-            )
-            kotlin_template = CodeTemplate(
-                name="默认模板 (Kotlin)",
-                language="kotlin",
-                content=default_content,
-                is_system=True,
-            )
-            db.session.add(java_template)
-            db.session.add(kotlin_template)
-            db.session.commit()
+    # 默认启动时不访问数据库：建表与初始数据由 `flask init-db` 一次性完成
+    if app.config.get("DATABASE_AUTO_CREATE"):
+        init_database(app)
+
+    search_index.init_app(app)
 
     app.register_blueprint(auth_bp)
     app.register_blueprint(charts_bp)
+    if app.config.get("METRICS_ENABLED", True):
+        metrics.init_app(app)
+    profiler.init_app(app)
 
     @app.get("/")
     def healthcheck():
         return jsonify({"message": "Accessibility Chart Tool API"})
 
-    worker.start(app)
+    @app.cli.command("init-db")
+    def init_db():
+        """创建数据表与全文索引，并写入系统模板。"""
+        seeded = init_database(app)
+        print(f"Database initialized, {seeded} system templates created.")
+
+    @app.cli.command("upgrade-db")
+    @click.option("--dry-run", is_flag=True, help="只输出将执行的语句，不修改数据库")
+    def upgrade_db(dry_run):
+        """为已部署的数据库补齐新增的列、索引与表（init-db 不会修改已有表）。"""
+        statements = migrations.upgrade_schema(app, dry_run=dry_run)
+        for statement in statements:
+            print(f"{statement};")
+        verb = "Would apply" if dry_run else "Applied"
+        print(f"{verb} {len(statements)} schema changes.")
+
+    @app.cli.command("chart-worker")
+    @click.option(
+        "--concurrency", type=int, default=None, help="本地分析并发度，默认取 CHART_WORKER_CONCURRENCY"
+    )
+    @click.option("--mode", type=click.Choice(sorted(WORKER_MODES)), default=None)
+    @click.option("--max-in-flight", type=int, default=None, help="http 分析后端同时在途的请求数")
+    @click.option("--metrics-port", type=int, default=None, help="在该端口单独提供 /metrics")
+    @click.option(
+        "--shutdown-timeout", type=float, default=30.0, show_default=True, help="停止时等待在途任务的秒数"
+    )
+    def chart_worker(concurrency, mode, max_in_flight, metrics_port, shutdown_timeout):
+        """独立运行后台处理池，收到 SIGINT / SIGTERM 后停止。"""
+        if queue_backend(app) != "database":
+            raise click.UsageError("独立处理进程需要 CHART_QUEUE_BACKEND=database")
+        if max_in_flight:
+            app.config["CHART_ANALYZER_MAX_IN_FLIGHT"] = max_in_flight
+        if metrics_port:
+            metrics.start_http_server(metrics_port, app=app)
+
+        stopping = threading.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *_: stopping.set())
+
+        worker.start(app, concurrency=concurrency, mode=mode)
+        compaction.start_periodic(app, stopping)
+        print(f"Chart worker {worker.worker_id} started.")
+        while not stopping.wait(1.0):
+            if not worker.is_running:
+                stopping.set()
+                raise click.ClickException("处理线程意外退出")
+        released = worker.stop(timeout=shutdown_timeout)
+        print(f"Chart worker stopped, {released} unfinished tasks returned to the queue.")
+
+    @app.cli.command("rebuild-search-index")
+    def rebuild_search_index():
+        """全量重建任务全文索引。"""
+        print(f"Indexed {search_index.rebuild()} tasks.")
+
+    @app.cli.command("compact")
+    @click.option("--dry-run", is_flag=True, help="只统计将被清理的数据，不删除")
+    @click.option(
+        "--retention-days", type=float, default=None, help="软删除数据的保留天数，默认取 COMPACTION_RETENTION_DAYS"
+    )
+    @click.option("--batch-size", type=int, default=None, help="每批删除的任务数")
+    @click.option("--skip-uploads", is_flag=True, help="不清理上传目录")
+    def compact(dry_run, retention_days, batch_size, skip_uploads):
+        """物理删除超过保留期的软删除任务与模板，并清理无人引用的上传文件。"""
+        report = compaction.compact(
+            app,
+            dry_run=dry_run,
+            retention_days=retention_days,
+            batch_size=batch_size,
+            include_uploads=not skip_uploads,
+        )
+        print(report.summary())
+        for error in report.errors:
+            print(f"  failed to remove {error}")
+
+    @app.cli.command("pack-task-results")
+    def pack_task_results():
+        """把编码前以 JSON 写入的结果分批转换为列式编码。"""
+        packed, last_id = 0, 0
+        while True:
+            batch = (
+                ChartTaskResult.query.filter(
+                    ChartTaskResult.id > last_id, ChartTaskResult.chart_data.is_(None)
+                )
+                .order_by(ChartTaskResult.id)
+                .limit(500)
+                .all()
+            )
+            if not batch:
+                break
+            for result in batch:
+                if result.legacy_data_points is not None or result.legacy_table_data is not None:
+                    result.set_chart_data(result.legacy_data_points, result.legacy_table_data)
+                    packed += 1
+            last_id = batch[-1].id
+            db.session.commit()
+        print(f"Packed {packed} task results.")
+
+    worker.init_app(app)
+    if app.config.get("CHART_WORKER_EMBEDDED"):
+        worker.start(app)
 
     return app
 
 
 if __name__ == "__main__":
-    application = create_app()
+    # 直接运行时为单进程开发模式：自动建表并在进程内启动处理池
+    application = create_app(
+        config_overrides={"DATABASE_AUTO_CREATE": True, "CHART_WORKER_EMBEDDED": True}
+    )
     application.run(host="0.0.0.0", port=5000, debug=True)
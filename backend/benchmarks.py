@@ -0,0 +1,414 @@
+"""可复现的性能基准。
+
+在临时目录中创建独立的数据库与上传目录，按参数批量生成用户、任务与结果，然后通过
+Flask 测试客户端驱动主要接口，并测量后台处理池在合成图片集上的吞吐量。结果以 JSON 输出，
+便于不同提交之间对比::
+
+    python -m backend.benchmarks --users 5 --tasks-per-user 2000 --output bench.json
+
+同一组参数与 ``--seed`` 生成的数据完全相同。
+"""
+from __future__ import annotations
+
+import argparse
+import io
+import json
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+import sqlalchemy
+from PIL import Image, ImageDraw
+
+from .app import create_app
+from .extensions import db
+from .models import ChartTask, ChartTaskResult, CodeTemplate, TaskStatus, TaskType, User
+from .search import search_index
+from .tasks import TaskPayload, worker
+
+BENCHMARK_PASSWORD = "benchmark"
+SEED_BATCH_SIZE = 1000
+_NAME_WORDS = ["销售", "季度", "收入", "增长", "用户", "访问", "revenue", "traffic", "sales", "trend"]
+
+
+def _percentile(samples: list[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _summarize(samples: list[float]) -> dict[str, Any]:
+    """把每次耗时（秒）汇总为毫秒统计。"""
+    return {
+        "iterations": len(samples),
+        "min_ms": round(min(samples) * 1000, 3),
+        "mean_ms": round(statistics.fmean(samples) * 1000, 3),
+        "p50_ms": round(_percentile(samples, 0.5) * 1000, 3),
+        "p95_ms": round(_percentile(samples, 0.95) * 1000, 3),
+        "max_ms": round(max(samples) * 1000, 3),
+        "ops_per_second": round(len(samples) / sum(samples), 2) if sum(samples) else None,
+    }
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=Path(__file__).resolve().parent,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _chart_image(rng: random.Random, size: tuple[int, int], fmt: str = "PNG") -> bytes:
+    """生成内容各不相同的折线图图片，避免命中按内容哈希的结果缓存。"""
+    width, height = size
+    image = Image.new("RGB", size, (255, 255, 255))
+    draw = ImageDraw.Draw(image)
+    points = [(x, rng.randint(height // 10, height - height // 10)) for x in range(0, width, 20)]
+    draw.line(points, fill=(rng.randint(0, 200), rng.randint(0, 200), 255), width=3)
+    buffer = io.BytesIO()
+    image.save(buffer, fmt)
+    return buffer.getvalue()
+
+
+def _result_payload(rng: random.Random, points: int) -> dict[str, Any]:
+    values = [rng.randint(10, 100) for _ in range(points)]
+    return {
+        "summary": "自动生成的图表摘要：" + "，".join(rng.sample(_NAME_WORDS, 3)),
+        "data_points": [
+            {
+                "id": index + 1,
+                "label": f"数据点 {index + 1}",
+                "value": value,
+                "x_percent": round(index / max(points - 1, 1) * 100, 2),
+                "y_percent": round(100 - value, 2),
+                "description": f"第 {index + 1} 个数据点的数值为 {value}。",
+            }
+            for index, value in enumerate(values)
+        ],
+        "table_data": [
+            {"label": f"数据点 {index + 1}", "value": value} for index, value in enumerate(values)
+        ],
+    }
+
+
+class BenchmarkRunner:
+    def __init__(self, args: argparse.Namespace) -> None:
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.workdir = Path(tempfile.mkdtemp(prefix="chart-bench-"))
+        database_url = args.database_url or f"sqlite:///{self.workdir / 'benchmark.db'}"
+        self.app = create_app(
+            config_overrides={
+                "SQLALCHEMY_DATABASE_URI": database_url,
+                "UPLOAD_FOLDER": str(self.workdir / "uploads"),
+                "DATABASE_AUTO_CREATE": True,
+                "CHART_WORKER_EMBEDDED": True,
+                "CHART_QUEUE_BACKEND": "memory",
+                "CHART_ANALYZER_BACKEND": "local",
+                "CHART_WORKER_CONCURRENCY": args.worker_concurrency,
+                "PROFILING_SAMPLE_RATE": 0.0,
+            }
+        )
+        self.client = self.app.test_client()
+        self.user_ids: list[int] = []
+        self.task_ids: list[int] = []
+        self.headers: dict[str, str] = {}
+        self.template_id: Optional[int] = None
+        self._etags: dict[str, str] = {}
+
+    # --- 数据准备 ---
+
+    def seed(self) -> dict[str, Any]:
+        started = time.perf_counter()
+        base_time = datetime.utcnow() - timedelta(days=self.args.days)
+        with self.app.app_context():
+            users = [
+                User(email=f"bench{index}@example.com", username=f"bench{index}")
+                for index in range(self.args.users)
+            ]
+            for user in users:
+                user.set_password(BENCHMARK_PASSWORD)
+            db.session.add_all(users)
+            db.session.commit()
+            self.user_ids = [user.id for user in users]
+
+            for user_id in self.user_ids:
+                for offset in range(0, self.args.tasks_per_user, SEED_BATCH_SIZE):
+                    count = min(SEED_BATCH_SIZE, self.args.tasks_per_user - offset)
+                    self._seed_batch(user_id, count, base_time)
+
+            self.template_id = (
+                CodeTemplate.query.filter_by(is_system=True).order_by(CodeTemplate.id).first().id
+            )
+            search_index.rebuild()
+            self.task_ids = [
+                task_id
+                for (task_id,) in db.session.query(ChartTask.id)
+                .filter(ChartTask.user_id == self.user_ids[0])
+                .order_by(ChartTask.id)
+            ]
+
+        token = self.client.post(
+            "/api/auth/login",
+            json={"identifier": "bench0", "password": BENCHMARK_PASSWORD},
+        ).get_json()["access_token"]
+        self.headers = {"Authorization": f"Bearer {token}"}
+        return {
+            "users": self.args.users,
+            "tasks": self.args.users * self.args.tasks_per_user,
+            "seconds": round(time.perf_counter() - started, 3),
+        }
+
+    def _seed_batch(self, user_id: int, count: int, base_time: datetime) -> None:
+        span = self.args.days * 86400
+        tasks = []
+        for _ in range(count):
+            created_at = base_time + timedelta(seconds=self.rng.randint(0, span))
+            tasks.append(
+                ChartTask(
+                    name=" ".join(self.rng.sample(_NAME_WORDS, 2)) + f" {self.rng.randint(1, 9999)}",
+                    type=TaskType.UPLOAD.value,
+                    status=TaskStatus.COMPLETED.value,
+                    user_id=user_id,
+                    image_path="seed.png",
+                    image_url="",
+                    created_at=created_at,
+                    updated_at=created_at,
+                )
+            )
+        db.session.add_all(tasks)
+        db.session.flush()
+        db.session.add_all(
+            ChartTaskResult(
+                task_id=task.id,
+                is_success=True,
+                **_result_payload(self.rng, self.args.points),
+            )
+            for task in tasks
+        )
+        db.session.commit()
+        db.session.expunge_all()
+
+    # --- 计时 ---
+
+    def measure(self, call: Callable[[int], Any]) -> dict[str, Any]:
+        for index in range(self.args.warmup):
+            call(index)
+        samples = []
+        for index in range(self.args.iterations):
+            started = time.perf_counter()
+            call(self.args.warmup + index)
+            samples.append(time.perf_counter() - started)
+        return _summarize(samples)
+
+    def _get(self, url: str) -> None:
+        response = self.client.get(url, headers=self.headers)
+        response.get_data()
+        response.close()
+        if response.status_code != 200:
+            raise RuntimeError(f"GET {url} returned {response.status_code}")
+
+    def _revalidate(self, url: str) -> None:
+        """携带上次响应的 ETag 重新请求，数据未变时应得到 304。"""
+        etag = self._etags.get(url)
+        if etag is None:
+            response = self.client.get(url, headers=self.headers)
+            etag = self._etags[url] = response.headers["ETag"]
+            response.close()
+        response = self.client.get(url, headers={**self.headers, "If-None-Match": etag})
+        response.get_data()
+        response.close()
+        if response.status_code != 304:
+            raise RuntimeError(f"GET {url} with If-None-Match returned {response.status_code}")
+
+    def _task_id(self, index: int) -> int:
+        return self.task_ids[(index * 7919) % len(self.task_ids)]
+
+    # --- 接口基准 ---
+
+    def bench_create_task(self, index: int) -> None:
+        image = _chart_image(self.rng, (320, 240))
+        response = self.client.post(
+            "/api/tasks",
+            data={"name": f"bench upload {index}", "file": (io.BytesIO(image), "chart.png")},
+            headers=self.headers,
+            content_type="multipart/form-data",
+        )
+        if response.status_code != 201:
+            raise RuntimeError(f"create_task returned {response.status_code}")
+
+    def api_benchmarks(self) -> dict[str, Any]:
+        days = self.args.days
+        date_from = (datetime.utcnow() - timedelta(days=days // 3)).isoformat(timespec="seconds")
+        date_to = (datetime.utcnow() - timedelta(days=days // 6)).isoformat(timespec="seconds")
+        cases: dict[str, Callable[[int], Any]] = {
+            "list_tasks": lambda i: self._get("/api/tasks?page=1&per_page=12"),
+            "list_tasks_deep_page": lambda i: self._get("/api/tasks?page=50&per_page=12"),
+            "list_tasks_summary": lambda i: self._get("/api/tasks?view=summary&per_page=12"),
+            "list_tasks_cursor": lambda i: self._get("/api/tasks?view=summary&cursor=&per_page=12"),
+            "list_tasks_keyword": lambda i: self._get(
+                f"/api/tasks?keyword={_NAME_WORDS[i % len(_NAME_WORDS)]}&per_page=12"
+            ),
+            "list_tasks_date_range": lambda i: self._get(
+                f"/api/tasks?created_from={date_from}&created_to={date_to}&per_page=12"
+            ),
+            "list_tasks_not_modified": lambda i: self._revalidate("/api/tasks?page=1&per_page=12"),
+            "get_task": lambda i: self._get(f"/api/tasks/{self._task_id(i)}"),
+            "get_task_not_modified": lambda i: self._revalidate(f"/api/tasks/{self.task_ids[0]}"),
+            "render_template": lambda i: self._get(
+                f"/api/tasks/{self._task_id(i)}/render-template?template_id={self.template_id}"
+            ),
+            "render_template_cached": lambda i: self._get(
+                f"/api/tasks/{self.task_ids[0]}/render-template?template_id={self.template_id}"
+            ),
+            "download_task_bundle": lambda i: self._get(f"/api/tasks/{self._task_id(i)}/download"),
+            "create_task": self.bench_create_task,
+        }
+        selected = self.args.only or list(cases)
+        return {name: self.measure(cases[name]) for name in selected if name in cases}
+
+    # --- 处理池吞吐 ---
+
+    def worker_throughput(self) -> dict[str, Any]:
+        """生成合成图片集并直接入队，测量全部处理完成所需的时间。"""
+        upload_folder = Path(self.app.config["UPLOAD_FOLDER"])
+        sizes = [(640, 480), (1280, 720), (1920, 1080), (3000, 2000)]
+        with self.app.app_context():
+            tasks = []
+            for index in range(self.args.images):
+                fmt = "JPEG" if index % 2 else "PNG"
+                filename = f"corpus-{index}.{fmt.lower()}"
+                size = sizes[index % len(sizes)]
+                (upload_folder / filename).write_bytes(_chart_image(self.rng, size, fmt))
+                tasks.append(
+                    ChartTask(
+                        name=f"corpus {index}",
+                        type=TaskType.UPLOAD.value,
+                        status=TaskStatus.QUEUED.value,
+                        user_id=self.user_ids[index % len(self.user_ids)],
+                        image_path=filename,
+                        image_url=f"/api/uploads/{filename}",
+                    )
+                )
+            db.session.add_all(tasks)
+            db.session.commit()
+            payloads = [
+                TaskPayload(
+                    task_id=task.id,
+                    image_path=str(upload_folder / task.image_path),
+                    public_image_url=task.image_url,
+                    user_id=task.user_id,
+                )
+                for task in tasks
+            ]
+            task_ids = [task.id for task in tasks]
+
+            started = time.perf_counter()
+            worker.enqueue_many(payloads)
+            deadline = started + self.args.worker_timeout
+            pending = len(task_ids)
+            while pending and time.perf_counter() < deadline:
+                time.sleep(0.05)
+                pending = (
+                    db.session.query(db.func.count(ChartTask.id))
+                    .filter(
+                        ChartTask.id.in_(task_ids),
+                        ChartTask.status.in_(
+                            [TaskStatus.QUEUED.value, TaskStatus.PROCESSING.value]
+                        ),
+                    )
+                    .scalar()
+                )
+                db.session.rollback()
+            elapsed = time.perf_counter() - started
+            failed = (
+                db.session.query(db.func.count(ChartTask.id))
+                .filter(ChartTask.id.in_(task_ids), ChartTask.status == TaskStatus.FAILED.value)
+                .scalar()
+            )
+        return {
+            "images": len(task_ids),
+            "concurrency": self.args.worker_concurrency,
+            "seconds": round(elapsed, 3),
+            "tasks_per_second": round((len(task_ids) - pending) / elapsed, 2),
+            "unfinished": pending,
+            "failed": failed,
+        }
+
+    def run(self) -> dict[str, Any]:
+        try:
+            seed = self.seed()
+            results: dict[str, Any] = {"api": self.api_benchmarks()}
+            if self.args.images:
+                results["worker"] = self.worker_throughput()
+            with self.app.app_context():
+                dialect = db.engine.dialect.name
+            return {
+                "meta": {
+                    "timestamp": datetime.utcnow().isoformat(timespec="seconds"),
+                    "revision": _git_revision(),
+                    "python": platform.python_version(),
+                    "platform": platform.platform(),
+                    "sqlalchemy": sqlalchemy.__version__,
+                    "database": dialect,
+                    "parameters": {
+                        key: value for key, value in vars(self.args).items() if key != "output"
+                    },
+                    "seed": seed,
+                },
+                "results": results,
+            }
+        finally:
+            if not self.args.keep:
+                shutil.rmtree(self.workdir, ignore_errors=True)
+
+
+def parse_args(argv: Optional[list[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="图表工具性能基准")
+    parser.add_argument("--users", type=int, default=3)
+    parser.add_argument("--tasks-per-user", type=int, default=1000)
+    parser.add_argument("--points", type=int, default=20, help="每个结果的数据点数量")
+    parser.add_argument("--days", type=int, default=90, help="任务创建时间分布的天数")
+    parser.add_argument("--iterations", type=int, default=30)
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--images", type=int, default=40, help="处理池吞吐测试的图片数量，0 跳过")
+    parser.add_argument("--worker-concurrency", type=int, default=4)
+    parser.add_argument("--worker-timeout", type=float, default=300.0)
+    parser.add_argument("--database-url", default=None, help="默认在临时目录中使用 SQLite")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument(
+        "--only",
+        type=lambda value: [item.strip() for item in value.split(",") if item.strip()],
+        default=None,
+        help="只运行指定的接口基准（逗号分隔）",
+    )
+    parser.add_argument("--keep", action="store_true", help="保留临时数据库与上传目录")
+    parser.add_argument("--output", default=None, help="结果写入文件，默认输出到标准输出")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[list[str]] = None) -> None:
+    args = parse_args(argv)
+    report = BenchmarkRunner(args).run()
+    payload = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        Path(args.output).write_text(payload + "\n", encoding="utf-8")
+    else:
+        sys.stdout.write(payload + "\n")
+
+
+if __name__ == "__main__":
+    main()
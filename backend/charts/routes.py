@@ -1,41 +1,56 @@
 from __future__ import annotations
 
-import io
+import base64
+import hashlib
 import json
-import uuid
+import os
+import queue
+import tempfile
+import time
 import zipfile
+import zlib
 from datetime import datetime
 from pathlib import Path
 from typing import Any
 
 from flask import (
+    Response,
     abort,
     current_app,
     jsonify,
     request,
-    send_file,
     send_from_directory,
+    stream_with_context,
     url_for,
 )
 from flask_jwt_extended import get_jwt_identity, jwt_required
-from sqlalchemy import or_
-from sqlalchemy.orm import joinedload
+from sqlalchemy import and_, func, or_
+from sqlalchemy.orm import aliased, contains_eager, defer, joinedload
+from werkzeug.datastructures import FileStorage
 from werkzeug.utils import secure_filename
 
+from ..database import read_replica
+from ..events import broker, task_feed
 from ..extensions import db
 from ..models import (
     ChartTask,
     ChartTaskResult,
     CodeTemplate,
+    TaskPriority,
     TaskStatus,
     TaskType,
 )
+from ..search import search_index
 from ..tasks import TaskPayload, worker
+from ..utils.analyzers import analyzer_version
 from ..utils.template_engine import (
     REQUIRED_TEMPLATE_PLACEHOLDERS,
+    invalidate_template,
     render_template_for_task,
     validate_template_content,
 )
+from ..utils.request_limits import body_limit
+from ..utils.zip_stream import stream_zip
 from . import bp
 
 
@@ -56,26 +71,109 @@ def _parse_datetime(value: str | None) -> datetime | None:
         return None
 
 
+def _parse_priority(value: str | None, default: TaskPriority) -> int:
+    """解析任务优先级：接受 ``interactive`` / ``bulk`` 或对应数值，缺省时取 ``default``。"""
+    if value is None or str(value).strip() == "":
+        return default.value
+    value = str(value).strip()
+    if value.isdigit() and int(value) in TaskPriority._value2member_map_:
+        return int(value)
+    try:
+        return TaskPriority[value.upper()].value
+    except KeyError:
+        raise ValueError("无效的任务优先级") from None
+
+
 def _ensure_template_access(template: CodeTemplate, user_id: int) -> bool:
     if template.is_system:
         return not template.is_deleted
     return template.user_id == user_id and not template.is_deleted
 
 
+# 响应结构变化时递增，使旧 ETag 全部失效
+ETAG_FORMAT_VERSION = 1
+
+
+def _compute_etag(*parts: Any) -> str:
+    """由 SQL 取得的版本信息计算强 ETag，无需加载大字段或序列化响应。"""
+    raw = json.dumps([ETAG_FORMAT_VERSION, *parts], default=str, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+
+def _not_modified(etag: str) -> Response | None:
+    """``If-None-Match`` 命中时返回 304 响应，否则返回 ``None``。"""
+    if etag not in request.if_none_match:
+        return None
+    return _with_etag(Response(status=304), etag)
+
+
+def _with_etag(response: Response, etag: str) -> Response:
+    response.set_etag(etag)
+    # 每次使用前都需重新验证，数据未变时只需一次 304
+    response.headers["Cache-Control"] = "private, no-cache"
+    return response
+
+
 @bp.get("/uploads/<path:filename>")
 def serve_upload(filename: str):
     upload_folder = current_app.config["UPLOAD_FOLDER"]
     return send_from_directory(upload_folder, filename)
 
 
-def _save_upload(file_storage) -> str:
+UPLOAD_CHUNK_SIZE = 64 * 1024
+ALLOWED_IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg", ".gif", ".bmp", ".webp"}
+
+
+def _save_upload(file_storage) -> tuple[str, str]:
+    """按内容哈希保存上传文件，返回 ``(文件名, sha256)``；相同内容只在磁盘上保存一份。"""
     upload_folder = Path(current_app.config["UPLOAD_FOLDER"])
     upload_folder.mkdir(parents=True, exist_ok=True)
     filename = secure_filename(file_storage.filename or "chart.png")
-    ext = Path(filename).suffix or ".png"
-    target = upload_folder / f"{uuid.uuid4().hex}{ext}"
-    file_storage.save(target)
-    return target.name
+    ext = Path(filename).suffix.lower() or ".png"
+
+    digest = hashlib.sha256()
+    fd, temp_name = tempfile.mkstemp(dir=upload_folder, suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as handle:
+            for chunk in iter(lambda: file_storage.stream.read(UPLOAD_CHUNK_SIZE), b""):
+                digest.update(chunk)
+                handle.write(chunk)
+        image_hash = digest.hexdigest()
+        target = upload_folder / f"{image_hash}{ext}"
+        if target.exists():
+            os.unlink(temp_name)
+            # 刷新修改时间，清理任务不会在新任务提交前删掉被复用的文件
+            os.utime(target)
+        else:
+            os.replace(temp_name, target)
+    except BaseException:
+        if os.path.exists(temp_name):
+            os.unlink(temp_name)
+        raise
+    return target.name, image_hash
+
+
+def _cached_results_query(image_hashes: set[str]):
+    return (
+        ChartTaskResult.query.join(ChartTask, ChartTask.id == ChartTaskResult.task_id)
+        .options(contains_eager(ChartTaskResult.task))
+        .filter(
+            ChartTask.image_hash.in_(image_hashes),
+            # 已删除任务的结果不再复用：所有者已删除，且会被压缩任务物理清理
+            ChartTask.is_deleted.is_(False),
+            ChartTaskResult.is_success.is_(True),
+            ChartTaskResult.processor_version == analyzer_version(current_app.config),
+        )
+        .order_by(ChartTaskResult.id.desc())
+    )
+
+
+def _find_cached_result(image_hash: str) -> ChartTaskResult | None:
+    return _cached_results_query({image_hash}).first()
+
+
+def _find_cached_results(image_hashes: set[str]) -> list[ChartTaskResult]:
+    return _cached_results_query(image_hashes).all()
 
 
 def _resolve_template(user_id: int, template_id: str | None) -> CodeTemplate | None:
@@ -91,34 +189,69 @@ def _resolve_template(user_id: int, template_id: str | None) -> CodeTemplate | N
     return template
 
 
-@bp.get("/tasks")
-@jwt_required()
-def list_tasks():
-    user_id = _current_user_id()
-    keyword = (request.args.get("keyword") or "").strip()
-    task_name = (request.args.get("task_name") or "").strip()
-    status_raw = request.args.get("status")
-    created_from = _parse_datetime(request.args.get("created_from"))
-    created_to = _parse_datetime(request.args.get("created_to"))
-    updated_from = _parse_datetime(request.args.get("updated_from"))
-    updated_to = _parse_datetime(request.args.get("updated_to"))
-    page = int(request.args.get("page", 1))
-    per_page = min(int(request.args.get("per_page", 12)), 50)
+TASK_SUMMARY_LENGTH = 120
+
+# 摘要视图可选的字段及其对应的列表达式；只选择需要的列，不加载任何 JSON 列
+TASK_SUMMARY_FIELDS: dict[str, Any] = {
+    "id": ChartTask.id,
+    "name": ChartTask.name,
+    "type": ChartTask.type,
+    "status": ChartTask.status,
+    "template_id": ChartTask.template_id,
+    "template_name": CodeTemplate.name,
+    "summary": func.substr(ChartTaskResult.summary, 1, TASK_SUMMARY_LENGTH),
+    "created_at": ChartTask.created_at,
+    "updated_at": ChartTask.updated_at,
+}
+
+
+_result_version = aliased(ChartTaskResult)
+_task_template = aliased(CodeTemplate)
+
+# 决定任务 JSON 内容的版本列：任务行本身、结果版本号与模板更新时间。
+# 结果与模板用相关子查询读取，可直接替换任意列表查询的选择列而不影响已有连接；
+# 状态、名称等随 updated_at 一并参与计算，避免秒级精度的时间戳漏掉同一秒内的变化
+TASK_VERSION_COLUMNS: tuple[Any, ...] = (
+    ChartTask.id,
+    ChartTask.created_at,
+    ChartTask.updated_at,
+    ChartTask.status,
+    ChartTask.attempts,
+    ChartTask.priority,
+    ChartTask.name,
+    ChartTask.template_id,
+    db.select(_result_version.version)
+    .where(_result_version.task_id == ChartTask.id)
+    .correlate(ChartTask)
+    .scalar_subquery()
+    .label("result_version"),
+    db.select(_task_template.updated_at)
+    .where(_task_template.id == ChartTask.template_id)
+    .correlate(ChartTask)
+    .scalar_subquery()
+    .label("template_updated_at"),
+)
 
-    query = (
-        ChartTask.query.options(
-            joinedload(ChartTask.template),
-            joinedload(ChartTask.result),
-        )
-        .filter_by(user_id=user_id, is_deleted=False)
-        .order_by(ChartTask.created_at.desc())
-    )
+
+def _apply_task_filters(query, args, user_id: int, result_joined: bool = False):
+    """按 ``list_tasks`` 的查询参数追加筛选条件，返回 ``(query, relevance)``。
+
+    关键字优先走全文索引，此时 ``relevance`` 为相关度列（越小越相关）；索引不可用时
+    退回 LIKE 查询，``relevance`` 为 ``None``。状态参数非法时抛出 ``ValueError``。
+    """
+    keyword = (args.get("keyword") or "").strip()
+    task_name = (args.get("task_name") or "").strip()
+    status_raw = args.get("status")
+    created_from = _parse_datetime(args.get("created_from"))
+    created_to = _parse_datetime(args.get("created_to"))
+    updated_from = _parse_datetime(args.get("updated_from"))
+    updated_to = _parse_datetime(args.get("updated_to"))
 
     if status_raw not in {None, ""}:
         try:
             status_value = int(status_raw)
         except (TypeError, ValueError):
-            return jsonify({"message": "无效的状态筛选"}), 400
+            raise ValueError("无效的状态筛选") from None
         query = query.filter(ChartTask.status == status_value)
     if task_name:
         query = query.filter(ChartTask.name.ilike(f"%{task_name}%"))
@@ -130,23 +263,193 @@ def list_tasks():
         query = query.filter(ChartTask.updated_at >= updated_from)
     if updated_to:
         query = query.filter(ChartTask.updated_at <= updated_to)
+    relevance = None
     if keyword:
-        like = f"%{keyword}%"
-        query = query.outerjoin(ChartTaskResult).filter(
-            or_(ChartTask.name.ilike(like), ChartTaskResult.summary.ilike(like))
+        match = search_index.match_subquery(user_id, keyword)
+        if match is not None:
+            query = query.join(match, match.c.task_id == ChartTask.id)
+            relevance = match.c.relevance
+        else:
+            like = f"%{keyword}%"
+            if not result_joined:
+                query = query.outerjoin(ChartTaskResult, ChartTaskResult.task_id == ChartTask.id)
+            query = query.filter(
+                or_(ChartTask.name.ilike(like), ChartTaskResult.summary.ilike(like))
+            )
+    return query, relevance
+
+
+def _parse_summary_fields(raw: str | None) -> list[str]:
+    if not raw:
+        return list(TASK_SUMMARY_FIELDS)
+    requested = {field.strip() for field in raw.split(",") if field.strip()}
+    unknown = requested - TASK_SUMMARY_FIELDS.keys()
+    if unknown:
+        raise ValueError(f"不支持的字段：{', '.join(sorted(unknown))}")
+    requested.add("id")
+    return [field for field in TASK_SUMMARY_FIELDS if field in requested]
+
+
+def _task_summary_query(user_id: int, fields: list[str]):
+    query = db.session.query(
+        *(TASK_SUMMARY_FIELDS[field].label(field) for field in fields)
+    ).select_from(ChartTask)
+    if "template_name" in fields:
+        query = query.outerjoin(CodeTemplate, CodeTemplate.id == ChartTask.template_id)
+    if "summary" in fields:
+        query = query.outerjoin(ChartTaskResult, ChartTaskResult.task_id == ChartTask.id)
+    return query.filter(ChartTask.user_id == user_id, ChartTask.is_deleted.is_(False))
+
+
+def _summary_row_to_dict(row) -> dict[str, Any]:
+    item = dict(row._mapping)
+    for key in ("created_at", "updated_at"):
+        if item.get(key) is not None:
+            item[key] = item[key].isoformat()
+    for key in ("type", "status"):
+        if item.get(key) is not None:
+            item[key] = int(item[key])
+    return item
+
+
+TASK_COUNT_ESTIMATE_CAP = 1000
+
+
+def _encode_cursor(created_at: datetime, task_id: int) -> str:
+    raw = json.dumps([created_at.isoformat(), task_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(token: str) -> tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        created_raw, task_id = json.loads(raw)
+        return datetime.fromisoformat(created_raw), int(task_id)
+    except (ValueError, TypeError):
+        raise ValueError("无效的分页游标") from None
+
+
+def _count_tasks(query, mode: str) -> tuple[int | None, bool]:
+    """返回 ``(总数, 是否为估算值)``；``approx`` 最多数到 ``TASK_COUNT_ESTIMATE_CAP`` 行。"""
+    if mode == "exact":
+        return query.order_by(None).count(), False
+    if mode == "approx":
+        capped = query.order_by(None).limit(TASK_COUNT_ESTIMATE_CAP + 1).count()
+        return min(capped, TASK_COUNT_ESTIMATE_CAP), capped > TASK_COUNT_ESTIMATE_CAP
+    return None, False
+
+
+def _list_tasks_by_cursor(query, per_page: int) -> tuple[list[Any], dict[str, Any]]:
+    """按 ``(created_at, id)`` 键集分页：深层页与首页代价相同，不做 OFFSET 和默认 COUNT。
+
+    ``query`` 只选择 ``TASK_VERSION_COLUMNS``，返回本页的版本行与分页字段。
+    """
+    cursor = request.args.get("cursor")
+    total_mode = request.args.get("total", "none")
+    if total_mode not in {"none", "exact", "approx"}:
+        raise ValueError("total 仅支持 none、exact 或 approx")
+    total, total_is_estimate = _count_tasks(query, total_mode)
+
+    if cursor:
+        created_at, task_id = _decode_cursor(cursor)
+        query = query.filter(
+            or_(
+                ChartTask.created_at < created_at,
+                and_(ChartTask.created_at == created_at, ChartTask.id < task_id),
+            )
+        )
+    rows = (
+        query.order_by(ChartTask.created_at.desc(), ChartTask.id.desc())
+        .limit(per_page + 1)
+        .all()
+    )
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    next_cursor = _encode_cursor(rows[-1].created_at, rows[-1].id) if has_more else None
+
+    body: dict[str, Any] = {"next_cursor": next_cursor, "has_more": has_more}
+    if total_mode != "none":
+        body["total"] = total
+        body["total_is_estimate"] = total_is_estimate
+    return rows, body
+
+
+def _task_list_items(user_id: int, task_ids: list[int], fields: list[str] | None):
+    """按版本查询选出的任务 ID 加载本页内容并保持原有顺序；``fields`` 为空时返回完整任务。"""
+    if not task_ids:
+        return []
+    if fields is not None:
+        rows = _task_summary_query(user_id, fields).filter(ChartTask.id.in_(task_ids)).all()
+        items = {row.id: _summary_row_to_dict(row) for row in rows}
+    else:
+        tasks = (
+            ChartTask.query.options(
+                joinedload(ChartTask.template),
+                joinedload(ChartTask.result),
+            )
+            .filter(ChartTask.id.in_(task_ids))
+            .all()
         )
+        items = {task.id: task.to_dict() for task in tasks}
+    return [items[task_id] for task_id in task_ids if task_id in items]
 
-    pagination = query.paginate(page=page, per_page=per_page, error_out=False)
-    items = [task.to_dict() for task in pagination.items]
 
-    return jsonify(
-        {
-            "items": items,
-            "page": pagination.page,
-            "pages": pagination.pages,
-            "total": pagination.total,
-        }
+@bp.get("/tasks")
+@jwt_required()
+@read_replica
+def list_tasks():
+    """分页列出任务。
+
+    ``view=summary``（或指定 ``fields=id,name,...``）时只查询列表所需的列，
+    摘要截断为 ``TASK_SUMMARY_LENGTH`` 个字符，不加载结果与模板的大字段。
+    传入 ``cursor``（首页传空值）或 ``pagination=cursor`` 时改用键集分页。
+    分页先只查询本页各任务的版本列并据此计算 ETag，``If-None-Match`` 命中时直接返回 304。
+    """
+    user_id = _current_user_id()
+    # 非整数按默认值处理；per_page 限制在 1..50，避免空页时取 rows[-1] 出错
+    page = max(request.args.get("page", 1, type=int), 1)
+    per_page = max(1, min(request.args.get("per_page", 12, type=int), 50))
+    summary_view = request.args.get("view") == "summary" or "fields" in request.args
+    cursor_mode = "cursor" in request.args or request.args.get("pagination") == "cursor"
+    fields = None
+
+    try:
+        if summary_view:
+            fields = _parse_summary_fields(request.args.get("fields"))
+            query = _task_summary_query(user_id, fields)
+            query, relevance = _apply_task_filters(
+                query, request.args, user_id, result_joined="summary" in fields
+            )
+        else:
+            query = ChartTask.query.filter_by(user_id=user_id, is_deleted=False)
+            query, relevance = _apply_task_filters(query, request.args, user_id)
+        query = query.with_entities(*TASK_VERSION_COLUMNS)
+
+        if cursor_mode:
+            rows, body = _list_tasks_by_cursor(query, per_page)
+    except ValueError as exc:
+        return jsonify({"message": str(exc)}), 400
+
+    if not cursor_mode:
+        # 关键字命中全文索引时按相关度排序；键集分页模式始终按时间排序
+        ordering = [ChartTask.created_at.desc(), ChartTask.id.desc()]
+        if relevance is not None:
+            ordering.insert(0, relevance.asc())
+        pagination = query.order_by(*ordering).paginate(
+            page=page, per_page=per_page, error_out=False
+        )
+        rows = pagination.items
+        body = {"page": pagination.page, "pages": pagination.pages, "total": pagination.total}
+
+    etag = _compute_etag(
+        user_id, sorted(request.args.items(multi=True)), body, [tuple(row) for row in rows]
     )
+    not_modified = _not_modified(etag)
+    if not_modified is not None:
+        return not_modified
+
+    body["items"] = _task_list_items(user_id, [row.id for row in rows], fields)
+    return _with_etag(jsonify(body), etag)
 
 
 @bp.post("/tasks")
@@ -186,10 +489,9 @@ def create_task():
             task=task,
             is_success=True,
             summary=summary,
-            data_points=payload.get("data_points") or [],
-            table_data=payload.get("table_data") or [],
             error_message=None,
         )
+        result.set_chart_data(payload.get("data_points") or [], payload.get("table_data") or [])
         db.session.add(result)
         db.session.commit()
         return jsonify(task.to_dict()), 201
@@ -209,31 +511,213 @@ def create_task():
 
     try:
         template = _resolve_template(user_id, template_id)
+        priority = _parse_priority(request.form.get("priority"), TaskPriority.INTERACTIVE)
     except ValueError as exc:
         return jsonify({"message": str(exc)}), 400
 
-    filename = _save_upload(file_storage)
-    public_url = url_for("charts.serve_upload", filename=filename, _external=True)
+    filename, image_hash = _save_upload(file_storage)
+    task = _new_upload_task(
+        user_id, name, template, filename, image_hash, _find_cached_result(image_hash), priority
+    )
+    db.session.add(task)
+    db.session.commit()
+
+    if task.status == TaskStatus.QUEUED:
+        worker.enqueue(_task_payload(task))
+
+    return jsonify(task.to_dict()), 201
+
 
+def _new_upload_task(
+    user_id: int,
+    name: str,
+    template: CodeTemplate | None,
+    filename: str,
+    image_hash: str,
+    cached: ChartTaskResult | None,
+    priority: int = TaskPriority.INTERACTIVE.value,
+) -> ChartTask:
     task = ChartTask(
         name=name,
         type=TaskType.UPLOAD.value,
-        status=TaskStatus.QUEUED.value,
+        status=TaskStatus.COMPLETED.value if cached else TaskStatus.QUEUED.value,
+        priority=priority,
         user_id=user_id,
         template=template,
+        image_path=filename,
+        image_url=url_for("charts.serve_upload", filename=filename, _external=True),
+        image_hash=image_hash,
     )
-    db.session.add(task)
-    db.session.commit()
+    if cached:
+        # 相同图片已由同版本分析器处理过，直接复用结果而不再入队
+        task.result = ChartTaskResult(
+            is_success=True,
+            summary=cached.summary,
+            error_message=None,
+            processor_version=cached.processor_version,
+        )
+        task.result.copy_chart_data(cached)
+    return task
+
 
-    worker.enqueue(
-        TaskPayload(
-            task_id=task.id,
-            image_path=str(Path(current_app.config["UPLOAD_FOLDER"]) / filename),
-            public_image_url=public_url,
+def _task_payload(task: ChartTask) -> TaskPayload:
+    return TaskPayload(
+        task_id=task.id,
+        image_path=str(Path(current_app.config["UPLOAD_FOLDER"]) / task.image_path),
+        public_image_url=task.image_url,
+        user_id=task.user_id,
+        priority=task.priority,
+    )
+
+
+def _iter_batch_uploads():
+    """依次产出 ``(文件名, FileStorage)``，覆盖多文件表单与 zip 压缩包两种输入。"""
+    for file_storage in request.files.getlist("files"):
+        yield file_storage.filename or "", file_storage
+
+    max_entry_size = current_app.config["MAX_CONTENT_LENGTH"]
+    for archive_storage in request.files.getlist("archive"):
+        try:
+            archive = zipfile.ZipFile(archive_storage.stream)
+        except zipfile.BadZipFile:
+            yield archive_storage.filename or "", None
+            continue
+        with archive:
+            for info in archive.infolist():
+                if info.is_dir() or Path(info.filename).name.startswith("."):
+                    continue
+                # 超过单张上传上限、加密或使用不支持压缩算法的条目逐项报错
+                if (max_entry_size and info.file_size > max_entry_size) or info.flag_bits & 0x1:
+                    yield info.filename, None
+                    continue
+                try:
+                    entry = archive.open(info)
+                except (zipfile.BadZipFile, NotImplementedError):
+                    yield info.filename, None
+                    continue
+                with entry:
+                    yield info.filename, FileStorage(stream=entry, filename=Path(info.filename).name)
+
+
+# 读取损坏的压缩包条目时可能抛出的异常（CRC 校验失败、压缩数据损坏或被截断）
+CORRUPT_ENTRY_ERRORS = (zipfile.BadZipFile, zlib.error, EOFError)
+
+
+@bp.post("/tasks/batch")
+@jwt_required()
+@body_limit("BATCH_UPLOAD_MAX_CONTENT_LENGTH")
+def create_tasks_batch():
+    user_id = _current_user_id()
+    try:
+        template = _resolve_template(user_id, request.form.get("template_id"))
+        # 批量导入默认按 bulk 优先级排队，避免挤占交互式上传
+        priority = _parse_priority(request.form.get("priority"), TaskPriority.BULK)
+    except ValueError as exc:
+        return jsonify({"message": str(exc)}), 400
+
+    max_items = current_app.config.get("BATCH_UPLOAD_MAX_ITEMS", 500)
+    saved: list[tuple[int, str, str, str]] = []
+    errors: list[dict[str, Any]] = []
+
+    for index, (source_name, file_storage) in enumerate(_iter_batch_uploads()):
+        if file_storage is None:
+            errors.append({"index": index, "filename": source_name, "message": "无法读取该文件"})
+            continue
+        if not source_name or Path(source_name).suffix.lower() not in ALLOWED_IMAGE_EXTENSIONS:
+            errors.append({"index": index, "filename": source_name, "message": "请选择有效的图片文件"})
+            continue
+        # 只有被接受的文件计入上限，前面被拒绝的条目不占名额
+        if len(saved) >= max_items:
+            errors.append({"index": index, "filename": source_name, "message": "超出单次批量上传上限"})
+            break
+        try:
+            filename, image_hash = _save_upload(file_storage)
+        except CORRUPT_ENTRY_ERRORS:
+            errors.append({"index": index, "filename": source_name, "message": "文件已损坏，无法读取"})
+            continue
+        saved.append((index, source_name, filename, image_hash))
+
+    if not saved:
+        return jsonify({"message": "没有可创建的任务", "items": [], "errors": errors}), 400
+
+    cached_by_hash: dict[str, ChartTaskResult] = {}
+    for result in _find_cached_results({image_hash for *_, image_hash in saved}):
+        cached_by_hash.setdefault(result.task.image_hash, result)
+
+    tasks = [
+        _new_upload_task(
+            user_id,
+            Path(source_name).stem or source_name,
+            template,
+            filename,
+            image_hash,
+            cached_by_hash.get(image_hash),
+            priority,
         )
+        for _, source_name, filename, image_hash in saved
+    ]
+    # 单次 flush 批量插入全部任务（及命中缓存的结果），整批一个事务
+    db.session.add_all(tasks)
+    db.session.commit()
+
+    worker.enqueue_many(
+        [_task_payload(task) for task in tasks if task.status == TaskStatus.QUEUED]
     )
 
-    return jsonify(task.to_dict()), 201
+    items = [
+        {"index": index, "filename": source_name, "task_id": task.id, "status": int(task.status)}
+        for (index, source_name, _, _), task in zip(saved, tasks)
+    ]
+    return jsonify({"items": items, "errors": errors}), 201
+
+
+def _format_sse(event: dict[str, Any]) -> str:
+    return f"event: status\nid: {event['id']}\ndata: {json.dumps(event)}\n\n"
+
+
+@bp.get("/tasks/events")
+@jwt_required(locations=["headers", "query_string"])
+@read_replica
+def task_events():
+    """推送当前用户任务的状态变更（SSE）。
+
+    浏览器的 EventSource 无法附带请求头，可通过 ``?jwt=<token>`` 传递令牌。
+    同进程处理线程的事件实时推送；其他进程的变更由 ``task_feed`` 按
+    ``TASK_EVENTS_POLL_INTERVAL`` 从数据库读取后推送（每个进程一条查询，与连接数无关）。
+    """
+    user_id = _current_user_id()
+    poll_interval = current_app.config.get("TASK_EVENTS_POLL_INTERVAL", 0.5)
+    keepalive = current_app.config.get("TASK_EVENTS_KEEPALIVE_SECONDS", 15.0)
+    task_feed.ensure_started(current_app._get_current_object())
+
+    def stream():
+        subscription = broker.subscribe(user_id)
+        last_status: dict[int, int] = {}
+        last_sent = time.monotonic()
+        try:
+            yield f"retry: {int(poll_interval * 1000)}\n\n"
+            while True:
+                try:
+                    event = subscription.get(timeout=keepalive)
+                except queue.Empty:
+                    event = None
+                # 同一变更可能同时来自进程内发布与数据库轮询，状态未变的事件不重复发送
+                if event is not None and last_status.get(event["id"]) != event["status"]:
+                    last_status[event["id"]] = event["status"]
+                    last_sent = time.monotonic()
+                    yield _format_sse(event)
+
+                if time.monotonic() - last_sent >= keepalive:
+                    last_sent = time.monotonic()
+                    yield ": keepalive\n\n"
+        finally:
+            broker.unsubscribe(user_id, subscription)
+
+    return Response(
+        stream_with_context(stream()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 def _load_task(task_id: int, user_id: int) -> ChartTask:
@@ -250,12 +734,74 @@ def _load_task(task_id: int, user_id: int) -> ChartTask:
     return task
 
 
+@bp.get("/tasks/dead-letter")
+@jwt_required()
+@read_replica
+def list_dead_letter_tasks():
+    """列出重试次数用尽后失败的任务（死信），附带尝试次数与最后一次错误信息。"""
+    user_id = _current_user_id()
+    page = int(request.args.get("page", 1))
+    per_page = min(int(request.args.get("per_page", 20)), 100)
+
+    query = (
+        db.session.query(
+            ChartTask.id,
+            ChartTask.name,
+            ChartTask.attempts,
+            ChartTask.updated_at,
+            ChartTaskResult.error_message,
+        )
+        .outerjoin(ChartTaskResult, ChartTaskResult.task_id == ChartTask.id)
+        .filter(
+            ChartTask.user_id == user_id,
+            ChartTask.is_deleted.is_(False),
+            ChartTask.status == TaskStatus.FAILED.value,
+        )
+        .order_by(ChartTask.updated_at.desc(), ChartTask.id.desc())
+    )
+    pagination = query.paginate(page=page, per_page=per_page, error_out=False)
+    return jsonify(
+        {
+            "items": [
+                {
+                    "id": row.id,
+                    "name": row.name,
+                    "attempts": row.attempts or 0,
+                    "error_message": row.error_message,
+                    "failed_at": row.updated_at.isoformat() if row.updated_at else None,
+                }
+                for row in pagination.items
+            ],
+            "page": pagination.page,
+            "pages": pagination.pages,
+            "total": pagination.total,
+        }
+    )
+
+
 @bp.get("/tasks/<int:task_id>")
 @jwt_required()
+@read_replica
 def get_task(task_id: int):
     user_id = _current_user_id()
+    version = (
+        db.session.query(*TASK_VERSION_COLUMNS)
+        .filter(
+            ChartTask.id == task_id,
+            ChartTask.user_id == user_id,
+            ChartTask.is_deleted.is_(False),
+        )
+        .first()
+    )
+    if version is None:
+        abort(404, description="任务不存在")
+    etag = _compute_etag(user_id, tuple(version))
+    not_modified = _not_modified(etag)
+    if not_modified is not None:
+        return not_modified
+
     task = _load_task(task_id, user_id)
-    return jsonify(task.to_dict())
+    return _with_etag(jsonify(task.to_dict()), etag)
 
 
 @bp.patch("/tasks/<int:task_id>")
@@ -293,6 +839,9 @@ def cancel_task(task_id: int):
         return jsonify({"message": "当前状态无法取消"}), 400
     task.status = TaskStatus.CANCELLED
     db.session.commit()
+    # 本进程中正在分析的任务立即中止；其他处理进程按 CHART_CANCEL_POLL_INTERVAL 发现取消
+    worker.cancel(task.id)
+    broker.publish_task(task)
     return jsonify({"message": "任务已取消"})
 
 
@@ -306,45 +855,122 @@ def delete_task(task_id: int):
     return jsonify({"message": "任务已删除"})
 
 
+TEMPLATE_FILE_SUFFIXES = {"java": ".java", "kotlin": ".kt"}
+
+
+def _task_bundle_entries(
+    task: ChartTask,
+    prefix: str = "",
+    include_image: bool = False,
+    template: CodeTemplate | None = None,
+):
+    """产出单个任务在压缩包中的条目 ``(路径, 内容)``。"""
+    result = task.result
+    yield f"{prefix}summary.txt", result.summary or ""
+    yield f"{prefix}table_data.json", json.dumps(result.table_data or [], ensure_ascii=False)
+    yield f"{prefix}data_points.json", json.dumps(result.data_points or [], ensure_ascii=False)
+    if include_image and task.image_path:
+        image = Path(current_app.config["UPLOAD_FOLDER"]) / task.image_path
+        if image.is_file():
+            yield f"{prefix}image{image.suffix}", image
+    if template is not None:
+        suffix = TEMPLATE_FILE_SUFFIXES.get(template.language.lower(), ".txt")
+        yield f"{prefix}rendered{suffix}", render_template_for_task(template, task, store=False)
+
+
+def _zip_response(chunks, download_name: str) -> Response:
+    return Response(
+        stream_with_context(chunks),
+        mimetype="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{download_name}"'},
+    )
+
+
 @bp.get("/tasks/<int:task_id>/download")
 @jwt_required()
+@read_replica
 def download_task_bundle(task_id: int):
     user_id = _current_user_id()
     task = _load_task(task_id, user_id)
     if not task.result or not task.result.is_success:
         return jsonify({"message": "任务尚未完成"}), 400
 
-    memory_file = io.BytesIO()
-    with zipfile.ZipFile(memory_file, "w") as archive:
-        archive.writestr("summary.txt", (task.result.summary or "").encode("utf-8"))
-        archive.writestr(
-            "table_data.json",
-            (json.dumps(task.result.table_data or [], ensure_ascii=False)).encode("utf-8"),
-        )
-        archive.writestr(
-            "data_points.json",
-            (json.dumps(task.result.data_points or [], ensure_ascii=False)).encode("utf-8"),
+    return _zip_response(
+        stream_zip(_task_bundle_entries(task)), f"task-{task.id}-bundle.zip"
+    )
+
+
+@bp.post("/tasks/export")
+@jwt_required()
+@read_replica
+def export_tasks_bundle():
+    """把多个任务导出为一个 zip，边生成边发送，内存占用不随任务数增长。
+
+    请求体：``task_ids`` 或 ``filters``（同批量渲染），可选 ``include_images``（附带原始
+    上传图片）与 ``template_id``（附带按该模板渲染的代码）。每个任务位于 ``task-<id>/``
+    目录，未完成或无权访问的任务记录在末尾的 ``manifest.json`` 中。
+    """
+    user_id = _current_user_id()
+    payload = request.get_json() or {}
+    include_images = bool(payload.get("include_images"))
+
+    template = None
+    if payload.get("template_id") is not None:
+        try:
+            template = _resolve_template(user_id, payload.get("template_id"))
+        except ValueError as exc:
+            return jsonify({"message": str(exc)}), 400
+        db.session.expunge(template)
+
+    try:
+        task_ids = _bulk_task_ids(user_id, payload)
+    except ValueError as exc:
+        return jsonify({"message": str(exc)}), 400
+
+    def entries():
+        exported: list[int] = []
+        skipped: list[dict[str, Any]] = []
+        for task_id, task in _iter_user_tasks(user_id, task_ids):
+            if task is None:
+                skipped.append({"task_id": task_id, "reason": "任务不存在"})
+                continue
+            if not task.result or not task.result.is_success:
+                skipped.append({"task_id": task_id, "reason": "任务尚未完成"})
+                continue
+            yield from _task_bundle_entries(
+                task, f"task-{task_id}/", include_images, template
+            )
+            exported.append(task_id)
+        yield "manifest.json", json.dumps(
+            {"exported": exported, "skipped": skipped}, ensure_ascii=False
         )
 
-    memory_file.seek(0)
-    return send_file(
-        memory_file,
-        mimetype="application/zip",
-        as_attachment=True,
-        download_name=f"task-{task.id}-bundle.zip",
-    )
+    return _zip_response(stream_zip(entries()), "tasks-bundle.zip")
 
 
 @bp.get("/tasks/<int:task_id>/render-template")
 @jwt_required()
+@read_replica
 def render_template_view(task_id: int):
     user_id = _current_user_id()
     template_id = request.args.get("template_id")
     if not template_id:
         return jsonify({"message": "缺少模板标识"}), 400
 
-    task = _load_task(task_id, user_id)
-    template = CodeTemplate.query.get(template_id)
+    # 大字段（模板内容、结果 JSON）延迟加载：命中渲染缓存时完全不需要读取
+    task = (
+        ChartTask.query.options(
+            joinedload(ChartTask.result)
+            .defer(ChartTaskResult.chart_data)
+            .defer(ChartTaskResult.legacy_data_points)
+            .defer(ChartTaskResult.legacy_table_data)
+        )
+        .filter_by(id=task_id, user_id=user_id, is_deleted=False)
+        .first()
+    )
+    if not task:
+        abort(404, description="任务不存在")
+    template = CodeTemplate.query.options(defer(CodeTemplate.content)).get(template_id)
     if not template or not _ensure_template_access(template, user_id):
         return jsonify({"message": "模板不可用"}), 404
 
@@ -356,19 +982,139 @@ def render_template_view(task_id: int):
     return jsonify({"content": rendered, "language": template.language})
 
 
+BULK_RENDER_CHUNK_SIZE = 500
+
+
+def _normalize_filters(filters: Any) -> dict[str, str]:
+    """把 JSON 中的 ``filters`` 转成与查询参数一致的字符串映射；值须为字符串（``status`` 可为整数）或 null。"""
+    if not isinstance(filters, dict):
+        raise ValueError("请提供 task_ids 或 filters")
+    normalized: dict[str, str] = {}
+    for key, value in filters.items():
+        if value is None:
+            continue
+        if key == "status" and isinstance(value, int) and not isinstance(value, bool):
+            value = str(value)
+        if not isinstance(value, str):
+            raise ValueError(f"filters.{key} 必须为字符串")
+        normalized[key] = value
+    return normalized
+
+
+def _bulk_task_ids(user_id: int, payload: dict[str, Any]) -> list[int]:
+    """解析批量操作的目标任务：显式 ``task_ids`` 或与 ``list_tasks`` 相同的 ``filters``。"""
+    limit = current_app.config.get("BULK_MAX_TASKS", 5000)
+    if "task_ids" in payload:
+        raw_ids = payload.get("task_ids")
+        if not isinstance(raw_ids, list):
+            raise ValueError("task_ids 必须为数组")
+        try:
+            task_ids = list(dict.fromkeys(int(task_id) for task_id in raw_ids))
+        except (TypeError, ValueError):
+            raise ValueError("task_ids 必须为整数数组") from None
+    else:
+        filters = _normalize_filters(payload.get("filters"))
+        query = db.session.query(ChartTask.id).filter(
+            ChartTask.user_id == user_id, ChartTask.is_deleted.is_(False)
+        )
+        query, _ = _apply_task_filters(query, filters, user_id)
+        task_ids = [
+            row.id
+            for row in query.order_by(ChartTask.created_at.desc(), ChartTask.id.desc()).limit(
+                limit + 1
+            )
+        ]
+    if len(task_ids) > limit:
+        raise ValueError(f"单次最多处理 {limit} 个任务")
+    return task_ids
+
+
+def _iter_user_tasks(user_id: int, task_ids: list[int]):
+    """按请求顺序产出 ``(task_id, ChartTask | None)``，每批一次查询连同结果一起加载。"""
+    for offset in range(0, len(task_ids), BULK_RENDER_CHUNK_SIZE):
+        chunk = task_ids[offset : offset + BULK_RENDER_CHUNK_SIZE]
+        tasks = {
+            task.id: task
+            for task in ChartTask.query.options(joinedload(ChartTask.result)).filter(
+                ChartTask.id.in_(chunk),
+                ChartTask.user_id == user_id,
+                ChartTask.is_deleted.is_(False),
+            )
+        }
+        for task_id in chunk:
+            yield task_id, tasks.get(task_id)
+        # 每批处理完释放对象，保持长列表导出时的内存稳定
+        db.session.expunge_all()
+
+
+@bp.post("/templates/<int:template_id>/render")
+@jwt_required()
+@read_replica
+def render_template_bulk(template_id: int):
+    """用同一模板批量渲染多个任务，以 JSON Lines 流式返回。
+
+    请求体为 ``{"task_ids": [...]}`` 或 ``{"filters": {...}}``（筛选参数同 ``GET /api/tasks``）。
+    每行输出 ``{"task_id", "content"}``，失败的任务输出 ``{"task_id", "error"}``。
+    """
+    user_id = _current_user_id()
+    template = CodeTemplate.query.get(template_id)
+    if not template or not _ensure_template_access(template, user_id):
+        return jsonify({"message": "模板不可用"}), 404
+
+    try:
+        task_ids = _bulk_task_ids(user_id, request.get_json() or {})
+    except ValueError as exc:
+        return jsonify({"message": str(exc)}), 400
+
+    # 预先解析模板并从会话中分离，批次间清理会话时不受影响
+    db.session.expunge(template)
+
+    def generate():
+        for task_id, task in _iter_user_tasks(user_id, task_ids):
+            line: dict[str, Any] = {"task_id": task_id}
+            if task is None:
+                line["error"] = "任务不存在"
+            else:
+                try:
+                    line["content"] = render_template_for_task(template, task, store=False)
+                except ValueError as exc:
+                    line["error"] = str(exc)
+            yield json.dumps(line, ensure_ascii=False) + "\n"
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="application/x-ndjson",
+        headers={"X-Template-Language": template.language},
+    )
+
+
 @bp.get("/templates")
 @jwt_required()
+@read_replica
 def list_templates():
     user_id = _current_user_id()
-    templates = (
+    query = (
         CodeTemplate.query.filter(
             (CodeTemplate.is_system == True) | (CodeTemplate.user_id == user_id)  # noqa: E712
         )
         .filter_by(is_deleted=False)
         .order_by(CodeTemplate.is_system.desc(), CodeTemplate.created_at.asc())
-        .all()
     )
-    return jsonify([template.to_dict() for template in templates])
+    # 先只查询版本列计算 ETag，命中时不读取模板内容
+    versions = query.with_entities(
+        CodeTemplate.id,
+        CodeTemplate.updated_at,
+        CodeTemplate.name,
+        CodeTemplate.language,
+        CodeTemplate.type,
+    ).all()
+    etag = _compute_etag(user_id, [tuple(row) for row in versions])
+    not_modified = _not_modified(etag)
+    if not_modified is not None:
+        return not_modified
+
+    templates = query.all()
+    return _with_etag(jsonify([template.to_dict() for template in templates]), etag)
 
 
 @bp.post("/templates")
@@ -456,6 +1202,7 @@ def update_template(template_id: int):
         template.content = content
 
     db.session.commit()
+    invalidate_template(template.id)
     return jsonify(template.to_dict())
 
 
@@ -471,6 +1218,7 @@ def delete_template(template_id: int):
 
     template.is_deleted = True
     db.session.commit()
+    invalidate_template(template.id)
     return jsonify({"message": "模板已删除"})
 
 
@@ -0,0 +1,245 @@
+"""清理软删除数据与无人引用的上传文件。
+
+``delete_task`` / ``delete_template`` 只设置 ``is_deleted``，上传文件按内容哈希命名、可被
+多个任务共用，因此删除时都不会立即清理。压缩任务在保留期（``COMPACTION_RETENTION_DAYS``）
+之后：
+
+- 分批物理删除软删除的任务及其结果，并清理全文索引中对应的行；
+- 删除软删除且已没有任何任务引用的自定义模板；
+- 删除上传目录中不再被任何任务引用的图片，以及中断上传遗留的 ``.part`` 临时文件。
+
+修改时间在 ``COMPACTION_UPLOAD_GRACE_SECONDS`` 之内的文件一律保留，避免删掉刚写入、
+任务尚未提交的上传。可用 ``flask compact --dry-run`` 只统计不删除，``flask chart-worker``
+按 ``COMPACTION_INTERVAL_SECONDS`` 定期执行。
+"""
+from __future__ import annotations
+
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Optional
+
+from flask import Flask
+
+from .extensions import db
+from .metrics import registry
+from .models import ChartTask, ChartTaskResult, CodeTemplate, TaskStatus
+from .search import search_index
+
+TEMP_UPLOAD_SUFFIX = ".part"
+# 只处理 _save_upload 写入的文件：内容哈希命名的图片与 mkstemp 生成的临时文件
+_UPLOAD_NAME_RE = re.compile(r"^[0-9a-f]{64}(\.[A-Za-z0-9]+)?$")
+_TEMP_NAME_RE = re.compile(rf"^tmp\w+{re.escape(TEMP_UPLOAD_SUFFIX)}$")
+
+compaction_removed = registry.counter(
+    "chart_compaction_removed_total",
+    "Rows and files removed by the compaction job, by kind.",
+    ("kind",),
+)
+
+
+@dataclass
+class CompactionReport:
+    dry_run: bool = False
+    tasks: int = 0
+    results: int = 0
+    templates: int = 0
+    files: int = 0
+    bytes: int = 0
+    errors: list[str] = field(default_factory=list)
+
+    def summary(self) -> str:
+        verb = "Would remove" if self.dry_run else "Removed"
+        return (
+            f"{verb} {self.tasks} tasks, {self.results} results, {self.templates} templates "
+            f"and {self.files} upload files ({self.bytes} bytes)."
+        )
+
+
+def _purgeable_tasks(cutoff: datetime):
+    # 处理中的任务仍可能被处理进程写回，留到下一轮
+    return db.session.query(ChartTask.id).filter(
+        ChartTask.is_deleted.is_(True),
+        ChartTask.updated_at < cutoff,
+        ChartTask.status != TaskStatus.PROCESSING.value,
+    )
+
+
+def _live_tasks(report: CompactionReport, cutoff: datetime):
+    """清理后仍保留的任务；``dry_run`` 时排除本轮将被删除的任务，统计与实际执行一致。"""
+    query = db.session.query(ChartTask.id)
+    if report.dry_run:
+        query = query.filter(~ChartTask.id.in_(_purgeable_tasks(cutoff)))
+    return query
+
+
+def _purge_tasks(report: CompactionReport, cutoff: datetime, batch_size: int) -> None:
+    if report.dry_run:
+        query = _purgeable_tasks(cutoff)
+        report.tasks = query.count()
+        report.results = ChartTaskResult.query.filter(
+            ChartTaskResult.task_id.in_(query)
+        ).count()
+        return
+
+    last_id = 0
+    while True:
+        ids = [
+            row[0]
+            for row in _purgeable_tasks(cutoff)
+            .filter(ChartTask.id > last_id)
+            .order_by(ChartTask.id.asc())
+            .limit(batch_size)
+        ]
+        if not ids:
+            break
+        results = ChartTaskResult.query.filter(ChartTaskResult.task_id.in_(ids)).delete(
+            synchronize_session=False
+        )
+        tasks = ChartTask.query.filter(ChartTask.id.in_(ids)).delete(synchronize_session=False)
+        # 批量删除不经过 flush 事件，索引行在同一事务中清理
+        search_index.reindex(db.session.connection(), ids)
+        db.session.commit()
+        report.tasks += tasks
+        report.results += results
+        last_id = ids[-1]
+    compaction_removed.inc(report.tasks, kind="tasks")
+    compaction_removed.inc(report.results, kind="results")
+
+
+def _purge_templates(report: CompactionReport, cutoff: datetime) -> None:
+    referenced = _live_tasks(report, cutoff).filter(ChartTask.template_id == CodeTemplate.id)
+    query = CodeTemplate.query.filter(
+        CodeTemplate.is_deleted.is_(True),
+        CodeTemplate.is_system.is_(False),
+        CodeTemplate.updated_at < cutoff,
+        ~referenced.exists(),
+    )
+    if report.dry_run:
+        report.templates = query.count()
+        return
+    report.templates = query.delete(synchronize_session=False)
+    db.session.commit()
+    compaction_removed.inc(report.templates, kind="templates")
+
+
+def _upload_candidates(upload_folder: Path, cutoff: float) -> list[os.DirEntry]:
+    if not upload_folder.is_dir():
+        return []
+    with os.scandir(upload_folder) as entries:
+        return [
+            entry
+            for entry in entries
+            if (_UPLOAD_NAME_RE.match(entry.name) or _TEMP_NAME_RE.match(entry.name))
+            and entry.is_file(follow_symlinks=False)
+            and entry.stat().st_mtime < cutoff
+        ]
+
+
+def _remove_file(report: CompactionReport, entry: os.DirEntry, cutoff: float) -> None:
+    try:
+        stat = os.stat(entry.path)
+        # 扫描之后又被同内容上传复用（_save_upload 会刷新修改时间）的文件保留
+        if stat.st_mtime >= cutoff:
+            return
+        if not report.dry_run:
+            os.unlink(entry.path)
+    except FileNotFoundError:
+        return
+    except OSError as exc:
+        report.errors.append(f"{entry.name}: {exc}")
+        return
+    report.files += 1
+    report.bytes += stat.st_size
+
+
+def _collect_uploads(
+    report: CompactionReport,
+    retention_cutoff: datetime,
+    upload_folder: Path,
+    grace_seconds: float,
+    batch_size: int,
+) -> None:
+    cutoff = time.time() - grace_seconds
+    candidates = _upload_candidates(upload_folder, cutoff)
+    for start in range(0, len(candidates), batch_size):
+        batch = candidates[start : start + batch_size]
+        names = [entry.name for entry in batch if not entry.name.endswith(TEMP_UPLOAD_SUFFIX)]
+        referenced: set[str] = set()
+        if names:
+            referenced = {
+                row[0]
+                for row in _live_tasks(report, retention_cutoff)
+                .with_entities(ChartTask.image_path)
+                .filter(ChartTask.image_path.in_(names))
+            }
+            db.session.rollback()
+        for entry in batch:
+            if entry.name not in referenced:
+                _remove_file(report, entry, cutoff)
+    if not report.dry_run:
+        compaction_removed.inc(report.files, kind="files")
+
+
+def compact(
+    app: Flask,
+    dry_run: bool = False,
+    retention_days: Optional[float] = None,
+    batch_size: Optional[int] = None,
+    include_uploads: bool = True,
+) -> CompactionReport:
+    """执行一轮清理，返回删除（``dry_run`` 时为将要删除）的数量。"""
+    config = app.config
+    if retention_days is None:
+        retention_days = config.get("COMPACTION_RETENTION_DAYS", 30)
+    batch_size = max(int(batch_size or config.get("COMPACTION_BATCH_SIZE", 500)), 1)
+    cutoff = datetime.utcnow() - timedelta(days=retention_days)
+    report = CompactionReport(dry_run=dry_run)
+
+    with app.app_context():
+        try:
+            _purge_tasks(report, cutoff, batch_size)
+            # 先删任务再删模板：只被已清理任务引用的模板可在同一轮删除
+            _purge_templates(report, cutoff)
+            if include_uploads:
+                # 任务行清理后才统计引用，保留期内软删除任务的图片仍保留
+                _collect_uploads(
+                    report,
+                    cutoff,
+                    Path(config["UPLOAD_FOLDER"]),
+                    config.get("COMPACTION_UPLOAD_GRACE_SECONDS", 3600),
+                    batch_size,
+                )
+        finally:
+            db.session.rollback()
+            db.session.remove()
+    return report
+
+
+def _compaction_loop(app: Flask, interval: float, stopping: threading.Event) -> None:
+    while not stopping.wait(interval):
+        try:
+            report = compact(app)
+        except Exception:  # pragma: no cover - 下一轮重试
+            app.logger.exception("Compaction failed")
+            continue
+        app.logger.info(report.summary())
+
+
+def start_periodic(app: Flask, stopping: threading.Event) -> Optional[threading.Thread]:
+    """按 ``COMPACTION_INTERVAL_SECONDS`` 在后台定期执行，间隔为 0 时不启动。"""
+    interval = float(app.config.get("COMPACTION_INTERVAL_SECONDS", 0) or 0)
+    if interval <= 0:
+        return None
+    thread = threading.Thread(
+        target=_compaction_loop,
+        args=(app, interval, stopping),
+        name="chart-compaction",
+        daemon=True,
+    )
+    thread.start()
+    return thread
@@ -17,6 +17,27 @@ class Config:
     )
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+    # === 数据库连接 ===
+    # 只读副本（逗号分隔的连接串）；列表、详情、模板等只读接口的查询发往副本
+    DATABASE_REPLICA_URLS = os.environ.get("DATABASE_REPLICA_URLS", "")
+    # 用户写请求后的这段时间内，其只读请求仍读主库，避免副本复制延迟
+    DATABASE_READ_YOUR_WRITES_SECONDS = float(
+        os.environ.get("DATABASE_READ_YOUR_WRITES_SECONDS", "5")
+    )
+    # 连接池（SQLite 不适用）：主库承担处理进程的状态与结果写入，副本承担仪表盘读流量
+    DATABASE_POOL_SIZE = int(os.environ.get("DATABASE_POOL_SIZE", "10"))
+    DATABASE_MAX_OVERFLOW = int(os.environ.get("DATABASE_MAX_OVERFLOW", "10"))
+    DATABASE_POOL_TIMEOUT = float(os.environ.get("DATABASE_POOL_TIMEOUT", "10"))
+    DATABASE_POOL_RECYCLE = int(os.environ.get("DATABASE_POOL_RECYCLE", "1800"))
+    DATABASE_REPLICA_POOL_SIZE = int(os.environ.get("DATABASE_REPLICA_POOL_SIZE", "20"))
+    DATABASE_REPLICA_MAX_OVERFLOW = int(os.environ.get("DATABASE_REPLICA_MAX_OVERFLOW", "20"))
+    DATABASE_REPLICA_POOL_TIMEOUT = float(os.environ.get("DATABASE_REPLICA_POOL_TIMEOUT", "5"))
+    DATABASE_REPLICA_POOL_RECYCLE = int(os.environ.get("DATABASE_REPLICA_POOL_RECYCLE", "1800"))
+    # 单机 SQLite：WAL 允许读写并发，busy_timeout 让写冲突时等待而不是立即报 database is locked
+    SQLITE_JOURNAL_MODE = os.environ.get("SQLITE_JOURNAL_MODE", "WAL")
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+    SQLITE_SYNCHRONOUS = os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL")
+
     # === JWT 常见安全配置（HS256，对称密钥）===
     JWT_SECRET_KEY = os.environ.get("JWT_SECRET_KEY", "dev-jwt-secret-key")
     JWT_ALGORITHM = os.environ.get("JWT_ALGORITHM", "HS256")
@@ -40,11 +61,73 @@ class Config:
     # 其他
     UPLOAD_FOLDER = os.environ.get("UPLOAD_FOLDER", str(BASE_DIR / "uploads"))
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB
+    # 批量上传（POST /api/tasks/batch）单独的请求体上限；压缩包中的单个条目仍受 MAX_CONTENT_LENGTH 限制。
+    # 默认 500 张、每张约 1MB 的导入可在一次请求内完成，反向代理的请求体上限需同步调整
+    BATCH_UPLOAD_MAX_CONTENT_LENGTH = int(
+        os.environ.get("BATCH_UPLOAD_MAX_CONTENT_LENGTH", str(512 * 1024 * 1024))
+    )
+    BATCH_UPLOAD_MAX_ITEMS = int(os.environ.get("BATCH_UPLOAD_MAX_ITEMS", "500"))
+    BULK_MAX_TASKS = int(os.environ.get("BULK_MAX_TASKS", "5000"))
+
+    # SSE 状态推送：每个 API 进程按该间隔查询一次最近变更的任务（覆盖独立处理进程中的变更），
+    # 与连接数无关
+    TASK_EVENTS_POLL_INTERVAL = float(os.environ.get("TASK_EVENTS_POLL_INTERVAL", "0.5"))
+    TASK_EVENTS_KEEPALIVE_SECONDS = float(os.environ.get("TASK_EVENTS_KEEPALIVE_SECONDS", "15"))
+
+    # Prometheus 指标端点 /metrics（队列深度、各阶段耗时、任务结果计数、接口耗时）
+    METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "True").lower() == "true"
+    # 请求剖析：管理员（逗号分隔的用户 ID）携带 X-Profile: 1 请求头，或按采样率随机开启
+    PROFILING_ADMIN_USER_IDS = os.environ.get("PROFILING_ADMIN_USER_IDS", "")
+    PROFILING_SAMPLE_RATE = float(os.environ.get("PROFILING_SAMPLE_RATE", "0"))
+    PROFILING_HISTORY = int(os.environ.get("PROFILING_HISTORY", "50"))
+
+    # 启动时自动建表并写入系统模板；默认关闭，部署时执行一次 `flask init-db`
+    DATABASE_AUTO_CREATE = os.environ.get("DATABASE_AUTO_CREATE", "False").lower() == "true"
+
+    # === 清理任务（`flask compact`）===
+    # 软删除超过保留天数的任务、结果与模板被物理删除，随后清理无人引用的上传文件
+    COMPACTION_RETENTION_DAYS = float(os.environ.get("COMPACTION_RETENTION_DAYS", "30"))
+    COMPACTION_BATCH_SIZE = int(os.environ.get("COMPACTION_BATCH_SIZE", "500"))
+    # 修改时间在该秒数内的上传文件不清理，避免误删任务尚未提交的新上传
+    COMPACTION_UPLOAD_GRACE_SECONDS = float(os.environ.get("COMPACTION_UPLOAD_GRACE_SECONDS", "3600"))
+    # `flask chart-worker` 定期执行清理的间隔秒数，0 表示不定期执行
+    COMPACTION_INTERVAL_SECONDS = float(os.environ.get("COMPACTION_INTERVAL_SECONDS", "0"))
+
+    # === 后台处理池 ===
+    # API 进程默认不运行处理池，由 `flask chart-worker` 独立运行并按需扩展；
+    # 单进程开发调试时可设为 True，在 API 进程内启动处理线程
+    CHART_WORKER_EMBEDDED = os.environ.get("CHART_WORKER_EMBEDDED", "False").lower() == "true"
+    # thread：线程直接调用分析函数（适合远程分析服务等 I/O 密集场景）
+    # process：分析工作交给进程池执行，按 CPU 核数扩展
+    CHART_WORKER_MODE = os.environ.get("CHART_WORKER_MODE", "thread")
+    CHART_WORKER_CONCURRENCY = int(
+        os.environ.get("CHART_WORKER_CONCURRENCY", str(os.cpu_count() or 1))
+    )
+    # memory：进程内队列；database：直接从 tasks 表领取任务，可跨进程共享且重启不丢失。
+    # 留空时处理池嵌入 API 进程则用 memory，否则用 database
+    CHART_QUEUE_BACKEND = os.environ.get("CHART_QUEUE_BACKEND", "")
+    CHART_QUEUE_LEASE_SECONDS = int(os.environ.get("CHART_QUEUE_LEASE_SECONDS", "60"))
+    CHART_QUEUE_POLL_INTERVAL = float(os.environ.get("CHART_QUEUE_POLL_INTERVAL", "1.0"))
+    # 处理进程检查在途任务是否已被取消的间隔（与租约心跳分开，取消后尽快释放名额）
+    CHART_CANCEL_POLL_INTERVAL = float(os.environ.get("CHART_CANCEL_POLL_INTERVAL", "1.0"))
+    # 分析失败后按指数退避（带抖动）延迟重试，用尽次数后任务标记为失败并进入死信列表
+    CHART_RETRY_MAX_ATTEMPTS = int(os.environ.get("CHART_RETRY_MAX_ATTEMPTS", "3"))
+    CHART_RETRY_BASE_DELAY = float(os.environ.get("CHART_RETRY_BASE_DELAY", "2.0"))
+    CHART_RETRY_MAX_DELAY = float(os.environ.get("CHART_RETRY_MAX_DELAY", "300"))
+    # local：本机执行 process_chart；http：异步调用远程分析服务，单个处理池可同时保持多个请求在途
+    CHART_ANALYZER_BACKEND = os.environ.get("CHART_ANALYZER_BACKEND", "local")
+    CHART_ANALYZER_URL = os.environ.get("CHART_ANALYZER_URL", "")
+    CHART_ANALYZER_MAX_IN_FLIGHT = int(os.environ.get("CHART_ANALYZER_MAX_IN_FLIGHT", "32"))
+    CHART_ANALYZER_TIMEOUT = float(os.environ.get("CHART_ANALYZER_TIMEOUT", "30"))
+    # 远程分析服务的版本，写入结果的 processor_version；服务升级后修改该值，旧结果不再被上传去重复用
+    CHART_ANALYZER_VERSION = os.environ.get("CHART_ANALYZER_VERSION", "")
 
 
 class TestConfig(Config):
     TESTING = True
     SQLALCHEMY_DATABASE_URI = "sqlite:///:memory:"
+    DATABASE_AUTO_CREATE = True
+    CHART_WORKER_CONCURRENCY = 1
 
 
 config_by_name = {
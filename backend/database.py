@@ -0,0 +1,220 @@
+"""数据库连接配置与读写分离。
+
+- ``configure_engines``：按配置补全主库与只读副本的连接池参数，副本注册为
+  ``replica_<n>`` bind（须在 ``db.init_app`` 之前调用）。
+- ``RoutingSession``：标记为只读的请求中，SELECT 发往本次请求选定的副本；flush 与
+  INSERT / UPDATE / DELETE、原生 SQL 始终使用主库。后台处理线程没有请求上下文，只访问主库。
+- ``read_replica``：视图装饰器。用户刚执行过写请求时，在 ``DATABASE_READ_YOUR_WRITES_SECONDS``
+  窗口内仍读主库，避免副本延迟导致刚创建或修改的任务“消失”。
+- ``init_app``：为 SQLite 连接设置 WAL、busy_timeout 等参数，并登记写请求。
+"""
+from __future__ import annotations
+
+import random
+import threading
+import time
+from collections import OrderedDict
+from functools import partial, wraps
+from typing import Any, Callable, Optional
+
+from flask import Flask, current_app, g, has_request_context, request
+from flask_jwt_extended import get_jwt_identity
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, make_url
+
+REPLICA_BIND_PREFIX = "replica_"
+# 写请求后返回的 Cookie，值为读主库截止的 Unix 时间戳；多个 API 进程之间借此传递读己之写窗口
+READ_YOUR_WRITES_COOKIE = "db_primary_until"
+_SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+
+def _pool_options(url: str, config: dict[str, Any], prefix: str) -> dict[str, Any]:
+    """``{prefix}POOL_SIZE`` 等配置对应的连接池参数；SQLite 使用自身的连接池，不设置。"""
+    if make_url(url).get_backend_name() == "sqlite":
+        return {}
+    options: dict[str, Any] = {"pool_pre_ping": True}
+    for key, option in (
+        ("POOL_SIZE", "pool_size"),
+        ("MAX_OVERFLOW", "max_overflow"),
+        ("POOL_TIMEOUT", "pool_timeout"),
+        ("POOL_RECYCLE", "pool_recycle"),
+    ):
+        value = config.get(f"{prefix}{key}")
+        if value is not None:
+            options[option] = value
+    return options
+
+
+def replica_urls(config: dict[str, Any]) -> list[str]:
+    raw = str(config.get("DATABASE_REPLICA_URLS") or "")
+    return [url.strip() for url in raw.split(",") if url.strip()]
+
+
+def configure_engines(app: Flask) -> None:
+    """补全 ``SQLALCHEMY_ENGINE_OPTIONS`` 并把只读副本注册为 binds；显式配置的引擎参数优先。"""
+    config = app.config
+    config["SQLALCHEMY_ENGINE_OPTIONS"] = {
+        **_pool_options(config["SQLALCHEMY_DATABASE_URI"], config, "DATABASE_"),
+        **(config.get("SQLALCHEMY_ENGINE_OPTIONS") or {}),
+    }
+    binds = dict(config.get("SQLALCHEMY_BINDS") or {})
+    for index, url in enumerate(replica_urls(config), start=1):
+        binds[f"{REPLICA_BIND_PREFIX}{index}"] = {
+            "url": url,
+            **_pool_options(url, config, "DATABASE_REPLICA_"),
+        }
+    config["SQLALCHEMY_BINDS"] = binds
+
+
+def _sqlite_pragmas(
+    journal_mode: str, busy_timeout_ms: int, synchronous: str, dbapi_connection, record
+) -> None:
+    del record
+    cursor = dbapi_connection.cursor()
+    try:
+        if journal_mode:
+            cursor.execute(f"PRAGMA journal_mode={journal_mode}")
+        cursor.execute(f"PRAGMA busy_timeout={int(busy_timeout_ms)}")
+        if synchronous:
+            cursor.execute(f"PRAGMA synchronous={synchronous}")
+    finally:
+        cursor.close()
+
+
+class _WriteTracker:
+    """记录各用户最近一次写请求后的读主库截止时间（进程内，容量有限）。"""
+
+    def __init__(self, capacity: int = 10000) -> None:
+        self._deadlines: OrderedDict[int, float] = OrderedDict()
+        self._capacity = capacity
+        self._lock = threading.Lock()
+
+    def mark(self, user_id: int, until: float) -> None:
+        with self._lock:
+            self._deadlines[user_id] = until
+            self._deadlines.move_to_end(user_id)
+            while len(self._deadlines) > self._capacity:
+                self._deadlines.popitem(last=False)
+
+    def active(self, user_id: int, now: float) -> bool:
+        with self._lock:
+            return self._deadlines.get(user_id, 0.0) > now
+
+
+write_tracker = _WriteTracker()
+
+
+def _request_user_id() -> Optional[int]:
+    try:
+        return int(get_jwt_identity())
+    except Exception:  # 未验证令牌或匿名请求
+        return None
+
+
+def _window() -> float:
+    return float(current_app.config.get("DATABASE_READ_YOUR_WRITES_SECONDS", 0) or 0)
+
+
+def _within_write_window() -> bool:
+    window = _window()
+    if window <= 0:
+        return False
+    now = time.time()
+    try:
+        until = float(request.cookies.get(READ_YOUR_WRITES_COOKIE, ""))
+    except ValueError:
+        until = 0.0
+    # 只认可不超过窗口长度的截止时间，客户端无法借 Cookie 长期绕开副本
+    if now < until <= now + window:
+        return True
+    user_id = _request_user_id()
+    return user_id is not None and write_tracker.active(user_id, now)
+
+
+def read_replica(view: Callable) -> Callable:
+    """视图中的查询路由到只读副本（未配置副本或处于读己之写窗口内时仍读主库）。
+
+    需放在 ``jwt_required`` 之下，以便识别当前用户。
+    """
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        g.db_read_only = True
+        g.db_use_replica = (
+            bool(current_app.extensions.get("db_replicas")) and not _within_write_window()
+        )
+        return view(*args, **kwargs)
+
+    return wrapper
+
+
+def _replica_engine(session: "RoutingSession") -> Optional[Engine]:
+    if not has_request_context() or not g.get("db_use_replica"):
+        return None
+    engine = g.get("db_replica_engine")
+    if engine is None:
+        keys = current_app.extensions.get("db_replicas") or []
+        if not keys:
+            return None
+        # 同一请求固定使用一个副本，避免多次查询看到不同的复制进度
+        engine = g.db_replica_engine = session._db.engines[random.choice(keys)]
+    return engine
+
+
+class RoutingSession(Session):
+    """在 Flask-SQLAlchemy 的按 bind 选择引擎之前，把只读请求中的 SELECT 交给副本。"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and getattr(clause, "is_select", False):
+            replica = _replica_engine(self)
+            if replica is not None:
+                return replica
+        return super().get_bind(mapper, clause=clause, bind=bind, **kwargs)
+
+
+def _remember_write(response):
+    """成功的写请求开启读己之写窗口：记录在本进程内，并通过 Cookie 带给其他 API 进程。"""
+    if (
+        request.method in _SAFE_METHODS
+        or g.get("db_read_only")
+        or response.status_code >= 400
+        or not current_app.extensions.get("db_replicas")
+    ):
+        return response
+    window = _window()
+    if window <= 0:
+        return response
+    until = time.time() + window
+    user_id = _request_user_id()
+    if user_id is not None:
+        write_tracker.mark(user_id, until)
+    response.set_cookie(
+        READ_YOUR_WRITES_COOKIE,
+        f"{until:.3f}",
+        max_age=int(window) + 1,
+        httponly=True,
+        samesite="Lax",
+    )
+    return response
+
+
+def init_app(app: Flask) -> None:
+    """在 ``db.init_app`` 之后、首次连接之前调用。"""
+    with app.app_context():
+        engines = dict(app.extensions["sqlalchemy"].engines)
+
+    pragmas = partial(
+        _sqlite_pragmas,
+        app.config.get("SQLITE_JOURNAL_MODE", "WAL"),
+        app.config.get("SQLITE_BUSY_TIMEOUT_MS", 5000),
+        app.config.get("SQLITE_SYNCHRONOUS", "NORMAL"),
+    )
+    for engine in engines.values():
+        if engine.dialect.name == "sqlite":
+            event.listen(engine, "connect", pragmas)
+
+    app.extensions["db_replicas"] = sorted(
+        key for key in engines if key and key.startswith(REPLICA_BIND_PREFIX)
+    )
+    app.after_request(_remember_write)
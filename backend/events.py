@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import queue
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Optional
+
+from flask import Flask
+
+from .extensions import db
+from .models import ChartTask
+
+
+def task_status_event(task: ChartTask) -> dict[str, Any]:
+    """状态变更事件只携带列表刷新所需的最少字段。"""
+    return {
+        "id": task.id,
+        "status": int(task.status),
+        "updated_at": task.updated_at.isoformat() if task.updated_at else None,
+    }
+
+
+class TaskEventBroker:
+    """按用户分发任务状态事件的进程内发布/订阅中心。
+
+    每个 SSE 连接持有一个有界队列；消费过慢的连接会丢弃事件而不会阻塞发布方。
+    其他进程（独立的处理进程）产生的变更由 ``TaskChangeFeed`` 从数据库读取后发布到这里。
+    """
+
+    def __init__(self, max_pending: int = 256) -> None:
+        self._max_pending = max_pending
+        self._subscribers: dict[int, set["queue.Queue[dict[str, Any]]"]] = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, user_id: int) -> "queue.Queue[dict[str, Any]]":
+        subscription: "queue.Queue[dict[str, Any]]" = queue.Queue(maxsize=self._max_pending)
+        with self._lock:
+            self._subscribers[user_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, user_id: int, subscription: "queue.Queue[dict[str, Any]]") -> None:
+        with self._lock:
+            subscribers = self._subscribers.get(user_id)
+            if not subscribers:
+                return
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[user_id]
+
+    def publish(self, user_id: int, event: dict[str, Any]) -> None:
+        with self._lock:
+            subscribers = list(self._subscribers.get(user_id, ()))
+        for subscription in subscribers:
+            try:
+                subscription.put_nowait(event)
+            except queue.Full:
+                pass
+
+    def publish_task(self, task: ChartTask) -> None:
+        self.publish(task.user_id, task_status_event(task))
+
+    def subscribed_users(self) -> list[int]:
+        with self._lock:
+            return list(self._subscribers)
+
+
+class TaskChangeFeed:
+    """跨进程的状态变更通道：每个 API 进程一个后台线程，按 ``TASK_EVENTS_POLL_INTERVAL``
+    查询有订阅者的用户最近变更的任务并发布到 ``broker``。
+
+    查询次数与 SSE 连接数无关。``updated_at`` 在 flush 时取值、提交稍晚才可见，处理进程与
+    API 进程的时钟也可能略有偏差，因此每次都回看 ``lookback`` 秒（``>=`` 比较），再按
+    ``(id, updated_at)`` 去重，同一时间戳的多行不会遗漏。
+    """
+
+    def __init__(self, broker: TaskEventBroker, lookback: float = 5.0) -> None:
+        self._broker = broker
+        self._lookback = timedelta(seconds=lookback)
+        self._seen: set[tuple[int, datetime]] = set()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def ensure_started(self, app: Flask) -> None:
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(
+                target=self._loop, args=(app,), name="task-change-feed", daemon=True
+            )
+            self._thread.start()
+
+    def _loop(self, app: Flask) -> None:
+        interval = float(app.config.get("TASK_EVENTS_POLL_INTERVAL", 0.5))
+        with app.app_context():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.poll()
+                except Exception:  # pragma: no cover - 数据库暂不可用，下一轮重试
+                    db.session.rollback()
+                finally:
+                    db.session.remove()
+
+    def poll(self) -> int:
+        """发布自上次以来变更的任务，返回发布的事件数。"""
+        users = self._broker.subscribed_users()
+        since = datetime.utcnow() - self._lookback
+        # 只保留回看窗口内的去重记录
+        self._seen = {key for key in self._seen if key[1] >= since}
+        if not users:
+            return 0
+        rows = (
+            db.session.query(ChartTask.id, ChartTask.user_id, ChartTask.status, ChartTask.updated_at)
+            .filter(
+                ChartTask.user_id.in_(users),
+                ChartTask.updated_at >= since,
+                ChartTask.is_deleted.is_(False),
+            )
+            .order_by(ChartTask.updated_at.asc(), ChartTask.id.asc())
+            .all()
+        )
+        # 结束只读事务，下次轮询才能看到其他连接提交的新数据
+        db.session.rollback()
+        published = 0
+        for row in rows:
+            key = (row.id, row.updated_at)
+            if key in self._seen:
+                continue
+            self._seen.add(key)
+            self._broker.publish(
+                row.user_id,
+                {"id": row.id, "status": int(row.status), "updated_at": row.updated_at.isoformat()},
+            )
+            published += 1
+        return published
+
+
+broker = TaskEventBroker()
+task_feed = TaskChangeFeed(broker)
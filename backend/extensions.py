@@ -1,6 +1,8 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_jwt_extended import JWTManager
 
+from .database import RoutingSession
 
-db = SQLAlchemy()
+
+db = SQLAlchemy(session_options={"class_": RoutingSession})
 jwt = JWTManager()
@@ -0,0 +1,266 @@
+from __future__ import annotations
+
+import logging
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterable, Iterator, Optional
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+from flask import Flask, Response, g, request
+
+# 秒级耗时的默认分桶，覆盖从毫秒级数据库操作到数十秒的远程分析
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_LabelValues = tuple[str, ...]
+
+logger = logging.getLogger(__name__)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict[str, str]) -> _LabelValues:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _samples(self) -> list[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        header = f"# HELP {self.name} {self.documentation}\n# TYPE {self.name} {self.kind}\n"
+        return header + "".join(line + "\n" for line in self._samples())
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self._values: dict[_LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def _samples(self) -> list[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in items
+        ]
+
+
+class Gauge(_Metric):
+    """抓取时通过回调取值的仪表，适合队列长度等已有数据结构中现成的数值。"""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, callback: Callable[[], float]) -> None:
+        super().__init__(name, documentation)
+        self._callback = callback
+
+    def _samples(self) -> list[str]:
+        try:
+            value = float(self._callback())
+        except Exception:  # 取值失败时不输出样本，但记录原因，避免指标无声消失
+            logger.exception("Failed to collect gauge %s", self.name)
+            return []
+        return [f"{self.name} {_format_value(value)}"]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        # 每组标签：各分桶计数（非累计）、总和、总数
+        self._values: dict[_LabelValues, tuple[list[int], list[float]]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        index = next(i for i, bound in enumerate(self.buckets) if value <= bound)
+        with self._lock:
+            counts, total = self._values.setdefault(key, ([0] * len(self.buckets), [0.0]))
+            counts[index] += 1
+            total[0] += value
+
+    @contextmanager
+    def time(self, **labels: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def _samples(self) -> list[str]:
+        with self._lock:
+            items = sorted(
+                (key, (list(counts), total[0])) for key, (counts, total) in self._values.items()
+            )
+        lines: list[str] = []
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}"
+                )
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """进程内指标集合，按 Prometheus 文本格式（0.0.4）输出。
+
+    指标保存在各自进程中：多进程部署时每个 API / 处理进程需要分别抓取。
+    """
+
+    def __init__(self) -> None:
+        self._metrics: dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, callback: Callable[[], float]) -> Gauge:
+        return self.register(Gauge(name, documentation, callback))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        buckets: Iterable[float] = DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda metric: metric.name)
+        return "".join(metric.render() for metric in metrics)
+
+
+registry = MetricsRegistry()
+
+task_outcomes = registry.counter(
+    "chart_tasks_total",
+    "Chart tasks finished by the worker, by outcome.",
+    ("outcome",),
+)
+stage_duration = registry.histogram(
+    "chart_stage_duration_seconds",
+    "Time spent in each processing stage.",
+    ("stage",),
+)
+request_duration = registry.histogram(
+    "http_request_duration_seconds",
+    "API request latency by blueprint endpoint.",
+    ("method", "endpoint", "status"),
+)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def observe_stage(stage: str, seconds: float) -> None:
+    stage_duration.observe(seconds, stage=stage)
+
+
+def init_app(app: Flask) -> None:
+    """注册请求耗时钩子与 ``/metrics`` 端点。"""
+
+    @app.before_request
+    def _start_timer() -> None:
+        g.metrics_started = time.perf_counter()
+
+    @app.after_request
+    def _record_latency(response):
+        started = g.pop("metrics_started", None)
+        if started is not None and request.endpoint not in {None, "metrics", "static"}:
+            request_duration.observe(
+                time.perf_counter() - started,
+                method=request.method,
+                endpoint=request.endpoint,
+                status=str(response.status_code),
+            )
+        return response
+
+    @app.get("/metrics", endpoint="metrics")
+    def metrics():
+        return Response(registry.render(), content_type=CONTENT_TYPE)
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_message(self, format: str, *args) -> None:  # noqa: A002
+        del format, args
+
+
+def start_http_server(
+    port: int, host: str = "0.0.0.0", app: Optional[Flask] = None
+) -> WSGIServer:
+    """在后台线程中单独提供 ``/metrics``，供不运行 Flask 服务的处理进程（``flask chart-worker``）使用。
+
+    传入 ``app`` 时在应用上下文中抓取，查询数据库的回调（如持久化队列长度）才能取值。
+    """
+
+    def render() -> str:
+        if app is None:
+            return registry.render()
+        with app.app_context():
+            return registry.render()
+
+    def application(environ, start_response):
+        if environ.get("PATH_INFO") != "/metrics":
+            start_response("404 Not Found", [("Content-Type", "text/plain")])
+            return [b"Not Found"]
+        body = render().encode("utf-8")
+        start_response(
+            "200 OK", [("Content-Type", CONTENT_TYPE), ("Content-Length", str(len(body)))]
+        )
+        return [body]
+
+    server = make_server(host, port, application, handler_class=_QuietHandler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
@@ -0,0 +1,79 @@
+"""已部署数据库的结构升级。
+
+``db.create_all()`` 只创建缺失的表，不会修改已有表。``upgrade_schema`` 对比模型与数据库中
+已有的列和索引，为已有表补齐缺失的列（``NOT NULL`` 列带上模型默认值作为
+``DEFAULT``，已有行随之回填）与索引，再创建缺失的表与全文索引。只增不删，可重复执行。
+由 ``flask upgrade-db`` 调用，加 ``--dry-run`` 只输出将执行的语句。
+"""
+from __future__ import annotations
+
+from flask import Flask
+from sqlalchemy import Column, Table, inspect, text
+from sqlalchemy.engine import Connection, Dialect
+from sqlalchemy.schema import CreateIndex
+
+from .extensions import db
+from .search import search_index
+
+
+def _default_literal(column: Column) -> str | None:
+    default = column.default
+    if default is None or not default.is_scalar:
+        return None
+    value = default.arg
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, (int, float)):
+        return str(value)
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def _add_column_sql(table: Table, column: Column, dialect: Dialect) -> str:
+    preparer = dialect.identifier_preparer
+    parts = [
+        f"ALTER TABLE {preparer.format_table(table)} ADD COLUMN",
+        preparer.format_column(column),
+        column.type.compile(dialect=dialect),
+    ]
+    default = _default_literal(column)
+    if default is not None:
+        parts.append(f"DEFAULT {default}")
+    if not column.nullable:
+        if default is None:
+            raise RuntimeError(f"{table.name}.{column.name} 为 NOT NULL 且没有默认值，无法自动补齐")
+        parts.append("NOT NULL")
+    return " ".join(parts)
+
+
+def pending_statements(connection: Connection) -> list[str]:
+    """返回把已有表升级到当前模型所需的语句；表不存在时交给 ``create_all`` 创建。"""
+    inspector = inspect(connection)
+    existing_tables = set(inspector.get_table_names())
+    statements: list[str] = []
+    for table in db.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        columns = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in columns:
+                statements.append(_add_column_sql(table, column, connection.dialect))
+        indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in sorted(table.indexes, key=lambda index: index.name):
+            if index.name not in indexes:
+                statements.append(str(CreateIndex(index).compile(dialect=connection.dialect)))
+    return statements
+
+
+def upgrade_schema(app: Flask, dry_run: bool = False) -> list[str]:
+    """补齐已有表的列与索引并创建缺失的表，返回执行（``dry_run`` 时为将要执行）的语句。"""
+    with app.app_context():
+        with db.engine.begin() as connection:
+            statements = pending_statements(connection)
+            if dry_run:
+                return statements
+            # MySQL 的 DDL 会隐式提交，逐条执行；中途失败后重新执行即可继续
+            for statement in statements:
+                connection.execute(text(statement))
+        db.create_all()
+    search_index.create_schema(app)
+    return statements
@@ -4,9 +4,17 @@ from datetime import datetime
 from enum import IntEnum
 from typing import Any
 
+from sqlalchemy import event
+from sqlalchemy.dialects import mysql
 from werkzeug.security import check_password_hash, generate_password_hash
 
 from .extensions import db
+from .utils.result_codec import DecodedChartData, decode_chart_data, encode_chart_data
+
+# SQLite 只有 INTEGER PRIMARY KEY 才会自增，其他数据库仍使用 BIGINT
+BigIntegerPK = db.BigInteger().with_variant(db.Integer(), "sqlite")
+# MySQL 的 BLOB 上限为 64KB，密集图表的编码结果需要 LONGBLOB
+PackedBinary = db.LargeBinary().with_variant(mysql.LONGBLOB(), "mysql")
 
 
 class TaskStatus(IntEnum):
@@ -17,6 +25,11 @@ class TaskStatus(IntEnum):
     CANCELLED = 4
 
 
+class TaskPriority(IntEnum):
+    INTERACTIVE = 0
+    BULK = 1
+
+
 class TaskType(IntEnum):
     UPLOAD = 0
     METADATA = 1
@@ -25,7 +38,7 @@ class TaskType(IntEnum):
 class User(db.Model):
     __tablename__ = "users"
 
-    id = db.Column(db.BigInteger, primary_key=True)
+    id = db.Column(BigIntegerPK, primary_key=True)
     email = db.Column(db.String(255), unique=True, nullable=False)
     username = db.Column(db.String(100), nullable=False)
     password_hash = db.Column(db.String(255), nullable=False)
@@ -63,13 +76,29 @@ class User(db.Model):
 
 class ChartTask(db.Model):
     __tablename__ = "tasks"
+    __table_args__ = (
+        db.Index("ix_tasks_status_created", "status", "created_at"),
+        db.Index("ix_tasks_status_priority", "status", "priority", "user_id", "created_at"),
+        db.Index("ix_tasks_image_hash", "image_hash"),
+        db.Index("ix_tasks_user_listing", "user_id", "is_deleted", "created_at", "id"),
+    )
 
-    id = db.Column(db.BigInteger, primary_key=True)
+    id = db.Column(BigIntegerPK, primary_key=True)
     name = db.Column(db.String(255), nullable=False)
     type = db.Column(db.SmallInteger, nullable=False, default=TaskType.UPLOAD.value)
     status = db.Column(db.SmallInteger, nullable=False, default=TaskStatus.QUEUED.value)
+    priority = db.Column(
+        db.SmallInteger, nullable=False, default=TaskPriority.INTERACTIVE.value
+    )
     user_id = db.Column(db.BigInteger, nullable=False)
     template_id = db.Column(db.BigInteger, nullable=True)
+    image_path = db.Column(db.String(500), nullable=True)
+    image_url = db.Column(db.String(500), nullable=True)
+    image_hash = db.Column(db.String(64), nullable=True)
+    locked_by = db.Column(db.String(100), nullable=True)
+    lease_expires_at = db.Column(db.DateTime, nullable=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     updated_at = db.Column(
         db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False
@@ -111,6 +140,7 @@ class ChartTask(db.Model):
             "name": self.name,
             "type": int(self.type),
             "status": int(self.status),
+            "priority": int(self.priority if self.priority is not None else TaskPriority.INTERACTIVE),
             "user_id": self.user_id,
             "template_id": self.template_id,
             "template": self.template.to_dict() if self.template else None,
@@ -118,6 +148,8 @@ class ChartTask(db.Model):
             "created_at": self.created_at.isoformat(),
             "updated_at": self.updated_at.isoformat() if self.updated_at else None,
             "is_deleted": self.is_deleted,
+            "attempts": self.attempts or 0,
+            "next_attempt_at": self.next_attempt_at.isoformat() if self.next_attempt_at else None,
             "summary": result_data.get("summary"),
             "data_points": result_data.get("data_points", []),
             "table_data": result_data.get("table_data", []),
@@ -128,13 +160,18 @@ class ChartTask(db.Model):
 class ChartTaskResult(db.Model):
     __tablename__ = "task_results"
 
-    id = db.Column(db.BigInteger, primary_key=True)
+    id = db.Column(BigIntegerPK, primary_key=True)
     task_id = db.Column(db.BigInteger, nullable=False, unique=True)
     is_success = db.Column(db.Boolean, default=False, nullable=False)
     summary = db.Column(db.Text, nullable=True)
-    data_points = db.Column(db.JSON, nullable=True)
-    table_data = db.Column(db.JSON, nullable=True)
+    # 数据点与表格数据按列式编码存放在 chart_data 中（见 utils/result_codec.py）；
+    # data_points / table_data 两列仅保留给编码前写入的旧记录
+    chart_data = db.Column(PackedBinary, nullable=True)
+    legacy_data_points = db.Column("data_points", db.JSON, nullable=True)
+    legacy_table_data = db.Column("table_data", db.JSON, nullable=True)
     error_message = db.Column(db.Text, nullable=True)
+    processor_version = db.Column(db.String(50), nullable=True)
+    version = db.Column(db.Integer, nullable=False, default=1)
     task = db.relationship(
         "ChartTask",
         primaryjoin="ChartTaskResult.task_id==ChartTask.id",
@@ -143,6 +180,59 @@ class ChartTaskResult(db.Model):
         foreign_keys=[task_id],
     )
 
+    def _decoded_chart_data(self) -> DecodedChartData | None:
+        blob = self.chart_data
+        if blob is None:
+            return None
+        # 以编码块本身作为缓存键：刷新或重新赋值后自动重新解码
+        cached = self.__dict__.get("_chart_data_cache")
+        if cached is None or cached[0] is not blob:
+            cached = (blob, decode_chart_data(blob))
+            self.__dict__["_chart_data_cache"] = cached
+        return cached[1]
+
+    @property
+    def data_points(self) -> list[dict[str, Any]] | None:
+        decoded = self._decoded_chart_data()
+        return decoded.get("data_points") if decoded is not None else self.legacy_data_points
+
+    @data_points.setter
+    def data_points(self, value: list[dict[str, Any]] | None) -> None:
+        self.set_chart_data(value, self.table_data)
+
+    @property
+    def table_data(self) -> list[dict[str, Any]] | None:
+        decoded = self._decoded_chart_data()
+        return decoded.get("table_data") if decoded is not None else self.legacy_table_data
+
+    @table_data.setter
+    def table_data(self, value: list[dict[str, Any]] | None) -> None:
+        self.set_chart_data(self.data_points, value)
+
+    def set_chart_data(
+        self,
+        data_points: list[dict[str, Any]] | None,
+        table_data: list[dict[str, Any]] | None,
+    ) -> None:
+        """一次写入两项数据并只编码一次；两者都为空时清空编码列。"""
+        if data_points is None and table_data is None:
+            self.chart_data = None
+        else:
+            self.chart_data = encode_chart_data(
+                {"data_points": data_points, "table_data": table_data}
+            )
+        self.legacy_data_points = None
+        self.legacy_table_data = None
+
+    def copy_chart_data(self, other: "ChartTaskResult") -> None:
+        """复用另一条结果的数据；已编码时直接复制编码块，无需解码。"""
+        if other.chart_data is not None:
+            self.chart_data = other.chart_data
+            self.legacy_data_points = None
+            self.legacy_table_data = None
+        else:
+            self.set_chart_data(other.legacy_data_points, other.legacy_table_data)
+
     def to_dict(self) -> dict[str, Any]:
         return {
             "task_id": self.task_id,
@@ -154,10 +244,17 @@ class ChartTaskResult(db.Model):
         }
 
 
+@event.listens_for(ChartTaskResult, "before_update")
+def _bump_result_version(mapper, connection, target: ChartTaskResult) -> None:
+    # 结果内容每次写入都递增版本号，供渲染缓存等以版本作为失效依据
+    del mapper, connection
+    target.version = (target.version or 0) + 1
+
+
 class CodeTemplate(db.Model):
     __tablename__ = "templates"
 
-    id = db.Column(db.BigInteger, primary_key=True)
+    id = db.Column(BigIntegerPK, primary_key=True)
     name = db.Column(db.String(255), nullable=False)
     type = db.Column(db.SmallInteger, nullable=False, default=0)
     language = db.Column(db.String(50), nullable=False)
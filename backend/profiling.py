@@ -0,0 +1,242 @@
+from __future__ import annotations
+
+import cProfile
+import io
+import pstats
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime
+from typing import Any, Optional
+
+from flask import Blueprint, Flask, abort, current_app, g, jsonify, request
+from flask_jwt_extended import get_jwt_identity, jwt_required, verify_jwt_in_request
+from sqlalchemy import event
+
+from .extensions import db
+
+PROFILE_HEADER = "X-Profile"
+PROFILE_ID_HEADER = "X-Profile-Id"
+PROFILE_STATS_LINES = 40
+PROFILE_TOP_QUERIES = 20
+# 不参与采样的端点：指标与剖析结果本身
+_EXCLUDED_ENDPOINTS = {
+    None,
+    "static",
+    "metrics",
+    "profiling.list_profiles",
+    "profiling.get_profile",
+}
+
+
+class _ProfileState:
+    def __init__(self, reason: str, user_id: Optional[int]) -> None:
+        self.id = uuid.uuid4().hex[:12]
+        self.reason = reason
+        self.user_id = user_id
+        self.started_at = datetime.utcnow()
+        self.started = time.perf_counter()
+        self.queries: dict[str, list[float]] = {}
+        self.profiler = cProfile.Profile()
+
+
+class RequestProfiler:
+    """按请求开启的性能剖析。
+
+    管理员（``PROFILING_ADMIN_USER_IDS``）携带 ``X-Profile: 1`` 请求头，或按
+    ``PROFILING_SAMPLE_RATE`` 随机抽中的请求会记录 cProfile 统计与 SQL 语句次数、耗时。
+    剖析在响应关闭时结束，流式响应（如打包下载）会覆盖整个生成过程。最近
+    ``PROFILING_HISTORY`` 条结果保存在进程内，可通过 ``/api/admin/profiles`` 查看。
+    """
+
+    def __init__(self) -> None:
+        self._local = threading.local()
+        self._profiles: deque[dict[str, Any]] = deque(maxlen=50)
+        self._lock = threading.Lock()
+        self._engines: set[int] = set()
+
+    def init_app(self, app: Flask) -> None:
+        with self._lock:
+            history = int(app.config.get("PROFILING_HISTORY", 50))
+            self._profiles = deque(self._profiles, maxlen=history)
+        with app.app_context():
+            # 主库与只读副本都计入 SQL 耗时
+            engines = list(db.engines.values())
+        for engine in engines:
+            if id(engine) in self._engines:
+                continue
+            event.listen(engine, "before_cursor_execute", self._before_cursor_execute)
+            event.listen(engine, "after_cursor_execute", self._after_cursor_execute)
+            self._engines.add(id(engine))
+
+        app.before_request(self._start)
+        app.after_request(self._attach)
+        app.teardown_request(self._discard)
+        app.register_blueprint(bp)
+
+    # --- 触发条件 ---
+
+    @staticmethod
+    def admin_ids() -> set[int]:
+        raw = str(current_app.config.get("PROFILING_ADMIN_USER_IDS", "") or "")
+        return {int(part) for part in raw.split(",") if part.strip().isdigit()}
+
+    def _requested_by_admin(self) -> Optional[int]:
+        if request.headers.get(PROFILE_HEADER, "").lower() not in {"1", "true", "yes"}:
+            return None
+        try:
+            verify_jwt_in_request(optional=True)
+            user_id = int(get_jwt_identity())
+        except Exception:
+            return None
+        return user_id if user_id in self.admin_ids() else None
+
+    def _start(self) -> None:
+        if request.endpoint in _EXCLUDED_ENDPOINTS:
+            return
+        user_id = self._requested_by_admin()
+        if user_id is not None:
+            reason = "header"
+        elif random.random() < float(current_app.config.get("PROFILING_SAMPLE_RATE", 0.0)):
+            reason = "sampled"
+        else:
+            return
+
+        previous: Optional[_ProfileState] = getattr(self._local, "state", None)
+        if previous is not None:
+            # 上一个响应未被关闭（服务器未调用 close），丢弃其剖析
+            previous.profiler.disable()
+
+        state = _ProfileState(reason, user_id)
+        try:
+            state.profiler.enable()
+        except ValueError:  # pragma: no cover - 线程上已有其他剖析器
+            return
+        self._local.state = state
+        g.profile_state = state
+
+    def _attach(self, response):
+        state: Optional[_ProfileState] = g.pop("profile_state", None)
+        if state is None:
+            return response
+        response.headers[PROFILE_ID_HEADER] = state.id
+        endpoint, method, path = request.endpoint, request.method, request.full_path.rstrip("?")
+        status = response.status_code
+        # 在响应关闭时收尾，流式响应的生成过程也计入本次剖析
+        response.call_on_close(lambda: self._finish(state, endpoint, method, path, status))
+        return response
+
+    def _discard(self, exc: Optional[BaseException]) -> None:
+        """请求未走到 ``after_request``（例如异常中断）时停止剖析，避免剖析器残留在线程上。"""
+        del exc
+        state: Optional[_ProfileState] = g.pop("profile_state", None)
+        if state is not None:
+            state.profiler.disable()
+            self._local.state = None
+
+    def _finish(
+        self, state: _ProfileState, endpoint: str, method: str, path: str, status: int
+    ) -> None:
+        state.profiler.disable()
+        if getattr(self._local, "state", None) is state:
+            self._local.state = None
+
+        stream = io.StringIO()
+        try:
+            stats = pstats.Stats(state.profiler, stream=stream)
+        except TypeError:  # 未采集到任何调用
+            pass
+        else:
+            stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(PROFILE_STATS_LINES)
+
+        queries = sorted(
+            (
+                {
+                    "statement": statement,
+                    "count": len(timings),
+                    "total_ms": round(sum(timings) * 1000, 3),
+                }
+                for statement, timings in state.queries.items()
+            ),
+            key=lambda item: item["total_ms"],
+            reverse=True,
+        )
+        profile = {
+            "id": state.id,
+            "reason": state.reason,
+            "user_id": state.user_id,
+            "method": method,
+            "path": path,
+            "endpoint": endpoint,
+            "status": status,
+            "started_at": state.started_at.isoformat(),
+            "duration_ms": round((time.perf_counter() - state.started) * 1000, 3),
+            "sql_count": sum(item["count"] for item in queries),
+            "sql_time_ms": round(sum(item["total_ms"] for item in queries), 3),
+            "queries": queries[:PROFILE_TOP_QUERIES],
+            "stats": stream.getvalue(),
+        }
+        with self._lock:
+            self._profiles.append(profile)
+
+    # --- SQL 计时 ---
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        del cursor, statement, parameters, context, executemany
+        if getattr(self._local, "state", None) is not None:
+            conn.info.setdefault("profile_started", []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        del cursor, parameters, context, executemany
+        state = getattr(self._local, "state", None)
+        started = conn.info.get("profile_started")
+        if state is None or not started:
+            return
+        state.queries.setdefault(statement, []).append(time.perf_counter() - started.pop())
+
+    # --- 查询 ---
+
+    def list(self) -> list[dict[str, Any]]:
+        with self._lock:
+            profiles = list(self._profiles)
+        return [
+            {key: value for key, value in profile.items() if key not in {"queries", "stats"}}
+            for profile in reversed(profiles)
+        ]
+
+    def get(self, profile_id: str) -> Optional[dict[str, Any]]:
+        with self._lock:
+            return next((p for p in self._profiles if p["id"] == profile_id), None)
+
+
+profiler = RequestProfiler()
+
+bp = Blueprint("profiling", __name__, url_prefix="/api/admin/profiles")
+
+
+def _require_admin() -> None:
+    try:
+        user_id = int(get_jwt_identity())
+    except (TypeError, ValueError):  # pragma: no cover - defensive
+        abort(401, description="Invalid authentication token.")
+    if user_id not in RequestProfiler.admin_ids():
+        abort(403, description="需要管理员权限")
+
+
+@bp.get("")
+@jwt_required()
+def list_profiles():
+    _require_admin()
+    return jsonify({"items": profiler.list()})
+
+
+@bp.get("/<profile_id>")
+@jwt_required()
+def get_profile(profile_id: str):
+    _require_admin()
+    profile = profiler.get(profile_id)
+    if profile is None:
+        abort(404, description="剖析记录不存在")
+    return jsonify(profile)
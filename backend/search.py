@@ -0,0 +1,258 @@
+from __future__ import annotations
+
+import re
+from itertools import chain
+from typing import Any, Iterable, Optional
+
+from flask import Flask, current_app, has_app_context
+from sqlalchemy import BigInteger, Float, bindparam, event, inspect, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+
+from .extensions import db
+from .models import ChartTask, ChartTaskResult
+
+SEARCH_TABLE = "task_search"
+REBUILD_BATCH_SIZE = 1000
+
+_CJK_RANGES = "\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff"
+_TOKEN_RE = re.compile(rf"[{_CJK_RANGES}]+|[^\W_{_CJK_RANGES}]+")
+_CJK_RE = re.compile(rf"[{_CJK_RANGES}]")
+
+_SQLITE_DDL = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} "
+    "USING fts5(name, summary, user_id UNINDEXED, tokenize='unicode61')"
+)
+_MYSQL_DDL = (
+    f"CREATE TABLE IF NOT EXISTS {SEARCH_TABLE} ("
+    "task_id BIGINT PRIMARY KEY, "
+    "user_id BIGINT NOT NULL, "
+    "name VARCHAR(255) NOT NULL, "
+    "summary TEXT, "
+    "KEY ix_task_search_user (user_id), "
+    "FULLTEXT KEY ft_task_search (name, summary) WITH PARSER ngram"
+    ") ENGINE=InnoDB DEFAULT CHARSET=utf8mb4"
+)
+
+
+def _tokens(value: str) -> list[list[str]]:
+    """把文本切分为词组：中日韩字符连续片段切为重叠二元组，其他文字按单词小写。"""
+    groups: list[list[str]] = []
+    for match in _TOKEN_RE.finditer(value or ""):
+        segment = match.group(0)
+        if _CJK_RE.match(segment):
+            if len(segment) == 1:
+                groups.append([segment])
+            else:
+                groups.append([segment[i : i + 2] for i in range(len(segment) - 1)])
+        else:
+            groups.append([segment.lower()])
+    return groups
+
+
+def tokenize_for_index(value: str | None) -> str:
+    return " ".join(chain.from_iterable(_tokens(value or "")))
+
+
+def _sqlite_match_expression(keyword: str) -> Optional[str]:
+    clauses: list[str] = []
+    for group in _tokens(keyword):
+        if len(group[0]) == 1 and _CJK_RE.match(group[0]):
+            # 单个汉字无法用二元组索引命中，交给 LIKE 兜底
+            return None
+        if _CJK_RE.match(group[0]):
+            clauses.append('"' + " ".join(group) + '"')
+        else:
+            clauses.append('"' + group[0] + '"*')
+    return " ".join(clauses) or None
+
+
+def _mysql_match_expression(keyword: str) -> Optional[str]:
+    terms = [term.replace('"', "") for term in keyword.split()]
+    terms = [term for term in terms if term]
+    if not terms or any(len(term) < 2 and _CJK_RE.match(term) for term in terms):
+        return None
+    return " ".join(f'+"{term}"' for term in terms)
+
+
+class TaskSearchIndex:
+    """任务名称与结果摘要的全文索引。
+
+    SQLite 使用 FTS5 虚拟表（写入前在 Python 中把中文切为二元组），MySQL 使用
+    ``WITH PARSER ngram`` 的 FULLTEXT 索引。索引在会话 flush 后同步维护，其他数据库
+    或关键字无法走索引时由调用方退回 LIKE 查询。索引表由 ``flask init-db`` 创建，
+    表不存在时同样退回 LIKE。
+    """
+
+    def __init__(self) -> None:
+        self._listening = False
+
+    def init_app(self, app: Flask) -> None:
+        if not self._listening:
+            event.listen(Session, "after_flush", self._after_flush)
+            self._listening = True
+
+    def create_schema(self, app: Flask) -> None:
+        """创建索引表（幂等），首次创建时全量回填。由 ``flask init-db`` 调用。"""
+        with app.app_context():
+            dialect = db.engine.dialect.name
+            ddl = {"sqlite": _SQLITE_DDL, "mysql": _MYSQL_DDL}.get(dialect)
+            if ddl is None:
+                return
+            try:
+                with db.engine.begin() as connection:
+                    created = not self._table_exists(connection, dialect)
+                    connection.execute(text(ddl))
+            except OperationalError:  # pragma: no cover - FTS5/ngram 不可用
+                app.logger.warning("Full-text search is unavailable; falling back to LIKE.")
+                return
+            app.extensions["task_search"] = dialect
+            if created:
+                self.rebuild()
+
+    @staticmethod
+    def _table_exists(connection, dialect: str) -> bool:
+        if dialect == "sqlite":
+            query = "SELECT 1 FROM sqlite_master WHERE name = :name"
+        else:
+            query = (
+                "SELECT 1 FROM information_schema.tables "
+                "WHERE table_schema = DATABASE() AND table_name = :name"
+            )
+        return connection.execute(text(query), {"name": SEARCH_TABLE}).first() is not None
+
+    @classmethod
+    def dialect(cls) -> Optional[str]:
+        """当前应用可用的索引方言；首次调用时检查索引表是否存在并缓存，启动时不访问数据库。"""
+        if not has_app_context():
+            return None
+        extensions = current_app.extensions
+        if "task_search" not in extensions:
+            extensions["task_search"] = cls._detect()
+        return extensions["task_search"]
+
+    @classmethod
+    def _detect(cls) -> Optional[str]:
+        dialect = db.engine.dialect.name
+        if dialect not in {"sqlite", "mysql"}:
+            return None
+        with db.engine.connect() as connection:
+            return dialect if cls._table_exists(connection, dialect) else None
+
+    def match_subquery(self, user_id: int, keyword: str):
+        """返回 ``(task_id, relevance)`` 子查询，值越小越相关；无法走索引时返回 ``None``。
+
+        列名不用 ``rank``：它是 MySQL 8 的保留字，也与 FTS5 的隐藏列同名。
+        """
+        dialect = self.dialect()
+        if dialect == "sqlite":
+            expression = _sqlite_match_expression(keyword)
+            sql = (
+                f"SELECT rowid AS task_id, bm25({SEARCH_TABLE}) AS relevance FROM {SEARCH_TABLE} "
+                f"WHERE {SEARCH_TABLE} MATCH :expression AND user_id = :user_id"
+            )
+        elif dialect == "mysql":
+            expression = _mysql_match_expression(keyword)
+            sql = (
+                f"SELECT task_id, -MATCH(name, summary) AGAINST (:expression IN BOOLEAN MODE) "
+                f"AS relevance FROM {SEARCH_TABLE} WHERE user_id = :user_id "
+                "AND MATCH(name, summary) AGAINST (:expression IN BOOLEAN MODE)"
+            )
+        else:
+            return None
+        if expression is None:
+            return None
+        return (
+            text(sql)
+            .bindparams(expression=expression, user_id=user_id)
+            .columns(task_id=BigInteger, relevance=Float)
+            .subquery("search_match")
+        )
+
+    def reindex(self, connection, task_ids: Iterable[int]) -> None:
+        dialect = self.dialect()
+        task_ids = sorted(set(task_ids))
+        if dialect is None or not task_ids:
+            return
+
+        rows = connection.execute(
+            text(
+                "SELECT t.id, t.user_id, t.name, r.summary FROM tasks t "
+                "LEFT JOIN task_results r ON r.task_id = t.id "
+                "WHERE t.id IN :ids AND t.is_deleted = :deleted"
+            ).bindparams(bindparam("ids", expanding=True)),
+            {"ids": task_ids, "deleted": False},
+        ).all()
+
+        key = "rowid" if dialect == "sqlite" else "task_id"
+        connection.execute(
+            text(f"DELETE FROM {SEARCH_TABLE} WHERE {key} IN :ids").bindparams(
+                bindparam("ids", expanding=True)
+            ),
+            {"ids": task_ids},
+        )
+        if not rows:
+            return
+
+        values: list[dict[str, Any]] = []
+        for task_id, user_id, name, summary in rows:
+            if dialect == "sqlite":
+                name, summary = tokenize_for_index(name), tokenize_for_index(summary)
+            values.append({"id": task_id, "user_id": user_id, "name": name, "summary": summary})
+        connection.execute(
+            text(
+                f"INSERT INTO {SEARCH_TABLE} ({key}, user_id, name, summary) "
+                "VALUES (:id, :user_id, :name, :summary)"
+            ),
+            values,
+        )
+
+    def rebuild(self) -> int:
+        """全量重建索引（首次启用或数据迁移后使用），返回写入的任务数。"""
+        if self.dialect() is None:
+            return 0
+        total = 0
+        last_id = 0
+        with db.engine.begin() as connection:
+            connection.execute(text(f"DELETE FROM {SEARCH_TABLE}"))
+        while True:
+            ids = [
+                row[0]
+                for row in db.session.query(ChartTask.id)
+                .filter(ChartTask.id > last_id, ChartTask.is_deleted.is_(False))
+                .order_by(ChartTask.id.asc())
+                .limit(REBUILD_BATCH_SIZE)
+            ]
+            if not ids:
+                break
+            with db.engine.begin() as connection:
+                self.reindex(connection, ids)
+            total += len(ids)
+            last_id = ids[-1]
+        db.session.rollback()
+        return total
+
+    def _after_flush(self, session: Session, flush_context) -> None:
+        del flush_context
+        if self.dialect() is None:
+            return
+
+        task_ids: set[int] = set()
+        for obj in chain(session.new, session.dirty, session.deleted):
+            if isinstance(obj, ChartTask) and obj.id is not None:
+                state = inspect(obj)
+                if obj in session.new or obj in session.deleted or any(
+                    state.attrs[attr].history.has_changes()
+                    for attr in ("name", "user_id", "is_deleted")
+                ):
+                    task_ids.add(obj.id)
+            elif isinstance(obj, ChartTaskResult) and obj.task_id is not None:
+                summary_history = inspect(obj).attrs.summary.history
+                if obj in session.new or obj in session.deleted or summary_history.has_changes():
+                    task_ids.add(obj.task_id)
+
+        if task_ids:
+            self.reindex(session.connection(), task_ids)
+
+
+search_index = TaskSearchIndex()
@@ -1,14 +1,31 @@
 from __future__ import annotations
+
+import heapq
+import itertools
+import os
 import queue
+import random
+import socket
 import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import CancelledError, Future
 from dataclasses import dataclass
-from typing import Optional
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Optional
 
-from flask import Flask
+from flask import Flask, current_app
 
+from .events import broker
 from .extensions import db
-from .models import ChartTask, ChartTaskResult, TaskStatus
-from .utils.chart_processing import process_chart
+from .metrics import observe_stage, registry, task_outcomes
+from .models import ChartTask, ChartTaskResult, TaskPriority, TaskStatus
+from .utils.analyzers import AnalyzerBackend, create_analyzer
+from .utils.chart_processing import CancellationToken, TaskCancelled
+
+WORKER_MODES = {"thread", "process"}
 
 
 @dataclass
@@ -16,68 +33,801 @@ class TaskPayload:
     task_id: int
     image_path: str
     public_image_url: str
+    user_id: int = 0
+    priority: int = TaskPriority.INTERACTIVE.value
 
 
-class ChartProcessingWorker:
+class FairTaskScheduler:
+    """按优先级与用户公平调度的待处理集合。
+
+    优先级数值越小越先处理；同一优先级内按用户轮转，每轮每个有积压的用户各取一个任务，
+    因此单个用户的大批量导入不会让其他用户的交互式上传长时间排队。
+    """
+
     def __init__(self) -> None:
-        self._queue: "queue.Queue[TaskPayload]" = queue.Queue()
-        self._thread: Optional[threading.Thread] = None
+        # priority -> {user_id: deque[TaskPayload]}，dict 保持用户的轮转顺序
+        self._levels: dict[int, dict[int, deque[TaskPayload]]] = {}
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def push(self, payload: TaskPayload) -> None:
+        users = self._levels.setdefault(payload.priority, {})
+        users.setdefault(payload.user_id, deque()).append(payload)
+        self._size += 1
+
+    def pop(self) -> TaskPayload:
+        priority = min(self._levels)
+        users = self._levels[priority]
+        user_id, pending = next(iter(users.items()))
+        payload = pending.popleft()
+        # 取出后把该用户移到队尾，实现轮转
+        del users[user_id]
+        if pending:
+            users[user_id] = pending
+        if not users:
+            del self._levels[priority]
+        self._size -= 1
+        return payload
+
+
+class QueueClosed(Exception):
+    """处理池停止后，等待中的 ``get`` 以此退出。"""
+
+
+class MemoryTaskQueue:
+    """进程内队列：入队即可见，但进程退出后未处理的任务会丢失。"""
+
+    def __init__(self) -> None:
+        self._pending = FairTaskScheduler()
+        self._condition = threading.Condition()
+        self._closed = False
+
+    def start(self, app: Flask, worker_id: str) -> None:
+        del app, worker_id
+        with self._condition:
+            self._closed = False
+
+    def close(self) -> None:
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+    def release(self) -> int:
+        # 未领取的任务留在内存中，处理池重新启动后继续处理
+        return 0
+
+    def put(self, payload: TaskPayload) -> None:
+        with self._condition:
+            self._pending.push(payload)
+            self._condition.notify()
+
+    def get(self) -> TaskPayload:
+        with self._condition:
+            while not self._pending:
+                if self._closed:
+                    raise QueueClosed()
+                self._condition.wait()
+            return self._pending.pop()
+
+    def task_done(self, payload: TaskPayload) -> None:
+        del payload
+
+    def depth(self) -> int:
+        with self._condition:
+            return len(self._pending)
+
+    def ownership_clause(self):
+        return db.true()
+
+
+class DatabaseTaskQueue:
+    """直接从 ``tasks`` 表领取任务的持久化队列。
+
+    领取通过条件更新 ``status=QUEUED -> PROCESSING`` 完成，只有更新成功的进程才拥有该任务，
+    因此任意数量的 API 进程与处理进程可以共享同一份积压。领取后写入 ``locked_by`` 与
+    ``lease_expires_at``，由心跳线程定期续租；租约过期的 ``PROCESSING`` 任务（进程崩溃或
+    重启遗留）会被放回 ``QUEUED`` 重新处理。
+
+    候选任务先按优先级排序，同一优先级内按用户排队序号（含处理中的任务）交错，
+    与内存队列一样在用户之间轮转（见 ``_candidates``）。
+    """
+
+    def __init__(
+        self,
+        lease_seconds: int = 60,
+        poll_interval: float = 1.0,
+        claim_batch: int = 5,
+        cancel_poll_interval: float = 1.0,
+    ) -> None:
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.cancel_poll_interval = cancel_poll_interval
+        self.claim_batch = claim_batch
+        self.worker_id = ""
+        self._wakeup = threading.Event()
+        self._leased: set[int] = set()
+        self._lock = threading.Lock()
+        self._heartbeat: Optional[threading.Thread] = None
+        self._cancel_watch: Optional[threading.Thread] = None
+        self._closed = threading.Event()
+        # 发现本进程持有的任务已被（其他进程中的接口）取消时回调
+        self.on_cancelled: Optional[Callable[[list[int]], None]] = None
+
+    def start(self, app: Flask, worker_id: str) -> None:
+        self.worker_id = worker_id
+        self._closed.clear()
+        with app.app_context():
+            self.recover_stale()
+        if self._heartbeat is None or not self._heartbeat.is_alive():
+            self._heartbeat = threading.Thread(
+                target=self._heartbeat_loop,
+                args=(app,),
+                name="chart-queue-heartbeat",
+                daemon=True,
+            )
+            self._heartbeat.start()
+        if self._cancel_watch is None or not self._cancel_watch.is_alive():
+            self._cancel_watch = threading.Thread(
+                target=self._cancel_watch_loop,
+                args=(app,),
+                name="chart-queue-cancel-watch",
+                daemon=True,
+            )
+            self._cancel_watch.start()
+
+    def close(self) -> None:
+        self._closed.set()
+        self._wakeup.set()
 
-    def start(self, app: Flask) -> None:
-        if self._thread and self._thread.is_alive():
+    def release(self) -> int:
+        """把本进程仍持有的处理中任务放回队列，停止时调用，其他处理进程无需等待租约过期。"""
+        released = (
+            ChartTask.query.filter(
+                ChartTask.status == TaskStatus.PROCESSING.value,
+                ChartTask.locked_by == self.worker_id,
+            ).update(
+                {
+                    ChartTask.status: TaskStatus.QUEUED.value,
+                    ChartTask.locked_by: None,
+                    ChartTask.lease_expires_at: None,
+                },
+                synchronize_session=False,
+            )
+        )
+        db.session.commit()
+        with self._lock:
+            self._leased.clear()
+        return released
+
+    def put(self, payload: TaskPayload) -> None:
+        # 任务行在提交时已处于 QUEUED 状态，这里只负责唤醒本进程内等待的线程
+        del payload
+        self._wakeup.set()
+
+    def get(self) -> TaskPayload:
+        while True:
+            if self._closed.is_set():
+                raise QueueClosed()
+            payload = self._claim()
+            if payload is not None:
+                return payload
+            self._wakeup.wait(self.poll_interval)
+            self._wakeup.clear()
+
+    def task_done(self, payload: TaskPayload) -> None:
+        with self._lock:
+            self._leased.discard(payload.task_id)
+
+    def ownership_clause(self):
+        return ChartTask.locked_by == self.worker_id
+
+    def depth(self) -> int:
+        return (
+            db.session.query(db.func.count(ChartTask.id))
+            .filter(
+                ChartTask.status == TaskStatus.QUEUED.value,
+                ChartTask.is_deleted.is_(False),
+            )
+            .scalar()
+        )
+
+    def _lease_deadline(self) -> datetime:
+        return datetime.utcnow() + timedelta(seconds=self.lease_seconds)
+
+    def _claim(self) -> Optional[TaskPayload]:
+        started = time.perf_counter()
+        try:
+            return self._claim_next()
+        finally:
+            observe_stage("claim", time.perf_counter() - started)
+
+    def _candidates(self) -> list[int]:
+        """按优先级、用户排队序号（含处理中的任务）、创建时间排出至多 ``claim_batch`` 个候选任务。
+
+        不对全部积压做窗口排序：先用 ``ix_tasks_status_priority`` 上的分组查询取出各用户
+        最早的排队时间（只读索引），再按轮转顺序为前几个用户各取最早的几条到期任务，
+        开销随有积压的用户数而不是任务数增长。
+        """
+        due = db.or_(
+            ChartTask.next_attempt_at.is_(None),
+            ChartTask.next_attempt_at <= datetime.utcnow(),
+        )
+        for priority in sorted(TaskPriority):
+            heads = (
+                db.session.query(ChartTask.user_id, db.func.min(ChartTask.created_at))
+                .filter(
+                    ChartTask.status == TaskStatus.QUEUED.value,
+                    ChartTask.priority == priority.value,
+                )
+                .group_by(ChartTask.user_id)
+                .all()
+            )
+            if not heads:
+                continue
+            # 已有任务在处理的用户排在后面，处理中的数量计入排队序号
+            processing = dict(
+                db.session.query(ChartTask.user_id, db.func.count(ChartTask.id))
+                .filter(
+                    ChartTask.status == TaskStatus.PROCESSING.value,
+                    ChartTask.priority == priority.value,
+                )
+                .group_by(ChartTask.user_id)
+                .all()
+            )
+            heads.sort(key=lambda head: (processing.get(head[0], 0), head[1], head[0]))
+
+            ranked: list[tuple[int, datetime, int]] = []
+            users = 0
+            for user_id, _ in heads:
+                # 只有等待重试、尚未到期的任务的用户不占名额，继续看下一个用户
+                rows = (
+                    db.session.query(ChartTask.id, ChartTask.created_at)
+                    .filter(
+                        ChartTask.status == TaskStatus.QUEUED.value,
+                        ChartTask.priority == priority.value,
+                        ChartTask.user_id == user_id,
+                        ChartTask.is_deleted.is_(False),
+                        due,
+                    )
+                    .order_by(ChartTask.created_at.asc(), ChartTask.id.asc())
+                    .limit(self.claim_batch)
+                    .all()
+                )
+                if not rows:
+                    continue
+                offset = processing.get(user_id, 0)
+                ranked.extend(
+                    (offset + position, created_at, task_id)
+                    for position, (task_id, created_at) in enumerate(rows, start=1)
+                )
+                users += 1
+                if users >= self.claim_batch:
+                    break
+            if ranked:
+                ranked.sort()
+                return [task_id for *_, task_id in ranked[: self.claim_batch]]
+        return []
+
+    def _claim_next(self) -> Optional[TaskPayload]:
+        candidates = self._candidates()
+        for task_id in candidates:
+            claimed = (
+                ChartTask.query.filter_by(id=task_id, status=TaskStatus.QUEUED.value).update(
+                    {
+                        ChartTask.status: TaskStatus.PROCESSING.value,
+                        ChartTask.locked_by: self.worker_id,
+                        ChartTask.lease_expires_at: self._lease_deadline(),
+                    },
+                    synchronize_session=False,
+                )
+            )
+            db.session.commit()
+            if not claimed:
+                continue
+
+            task = db.session.get(ChartTask, task_id)
+            with self._lock:
+                self._leased.add(task_id)
+            return TaskPayload(
+                task_id=task_id,
+                image_path=str(Path(current_app.config["UPLOAD_FOLDER"]) / (task.image_path or "")),
+                public_image_url=task.image_url or "",
+                user_id=task.user_id,
+                priority=task.priority,
+            )
+        return None
+
+    def recover_stale(self) -> int:
+        recovered = (
+            ChartTask.query.filter(
+                ChartTask.status == TaskStatus.PROCESSING.value,
+                db.or_(
+                    ChartTask.lease_expires_at.is_(None),
+                    ChartTask.lease_expires_at < datetime.utcnow(),
+                ),
+            ).update(
+                {
+                    ChartTask.status: TaskStatus.QUEUED.value,
+                    ChartTask.locked_by: None,
+                    ChartTask.lease_expires_at: None,
+                },
+                synchronize_session=False,
+            )
+        )
+        db.session.commit()
+        if recovered:
+            self._wakeup.set()
+        return recovered
+
+    def _renew_leases(self) -> None:
+        with self._lock:
+            leased = list(self._leased)
+        if not leased:
             return
+        ChartTask.query.filter(
+            ChartTask.id.in_(leased),
+            ChartTask.locked_by == self.worker_id,
+            ChartTask.status == TaskStatus.PROCESSING.value,
+        ).update(
+            {ChartTask.lease_expires_at: self._lease_deadline()},
+            synchronize_session=False,
+        )
+        db.session.commit()
+
+    def _check_cancelled(self) -> None:
+        with self._lock:
+            leased = list(self._leased)
+        if not leased or self.on_cancelled is None:
+            return
+        cancelled = [
+            task_id
+            for (task_id,) in db.session.query(ChartTask.id).filter(
+                ChartTask.id.in_(leased),
+                ChartTask.status == TaskStatus.CANCELLED.value,
+            )
+        ]
+        db.session.rollback()
+        if cancelled:
+            self.on_cancelled(cancelled)
+
+    def _heartbeat_loop(self, app: Flask) -> None:
+        interval = max(self.lease_seconds / 3, 1)
+        with app.app_context():
+            while True:
+                time.sleep(interval)
+                try:
+                    self._renew_leases()
+                    self.recover_stale()
+                except Exception:  # pragma: no cover - keep heartbeat alive
+                    db.session.rollback()
+                finally:
+                    db.session.remove()
+
+    def _cancel_watch_loop(self, app: Flask) -> None:
+        # 独立于租约心跳、以更短的间隔检查取消，处理进程与 API 分离时也能及时释放名额
+        with app.app_context():
+            while True:
+                time.sleep(self.cancel_poll_interval)
+                try:
+                    self._check_cancelled()
+                except Exception:  # pragma: no cover - keep watching
+                    db.session.rollback()
+                finally:
+                    db.session.remove()
+
+
+class RetrySchedule:
+    """延迟重试队列：按到期时间保存待重试的任务，到期后由后台线程重新投递到任务队列。
+
+    等待期间不占用分发线程或在途名额。内存队列依赖它重新入队；数据库队列中任务行的
+    ``next_attempt_at`` 已决定何时可被领取，这里的投递只负责及时唤醒本进程的领取线程。
+    """
 
-        self._thread = threading.Thread(target=self._run, args=(app,), daemon=True)
+    def __init__(self) -> None:
+        self._heap: list[tuple[float, int, TaskPayload]] = []
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, deliver) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(
+            target=self._loop, args=(deliver,), name="chart-worker-retry", daemon=True
+        )
         self._thread.start()
 
+    def schedule(self, payload: TaskPayload, delay: float) -> None:
+        with self._condition:
+            heapq.heappush(self._heap, (time.monotonic() + delay, next(self._counter), payload))
+            self._condition.notify()
+
+    def __len__(self) -> int:
+        with self._condition:
+            return len(self._heap)
+
+    def _loop(self, deliver) -> None:
+        while True:
+            with self._condition:
+                while not self._heap or self._heap[0][0] > time.monotonic():
+                    timeout = self._heap[0][0] - time.monotonic() if self._heap else None
+                    self._condition.wait(timeout)
+                _, _, payload = heapq.heappop(self._heap)
+            deliver(payload)
+
+
+def retry_delay(attempt: int, base: float, cap: float) -> float:
+    """第 ``attempt`` 次失败后的等待秒数：指数退避，取上限后在后半段随机抖动，避免集中重试。"""
+    delay = min(cap, base * (2 ** max(attempt - 1, 0)))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+def queue_backend(app: Flask) -> str:
+    """未显式配置时，处理池嵌入 API 进程则用内存队列，否则用可跨进程共享的数据库队列。"""
+    backend = app.config.get("CHART_QUEUE_BACKEND") or (
+        "memory" if app.config.get("CHART_WORKER_EMBEDDED") else "database"
+    )
+    return backend.lower()
+
+
+def create_task_queue(app: Flask) -> MemoryTaskQueue | DatabaseTaskQueue:
+    backend = queue_backend(app)
+    if backend == "memory":
+        return MemoryTaskQueue()
+    if backend == "database":
+        return DatabaseTaskQueue(
+            lease_seconds=int(app.config.get("CHART_QUEUE_LEASE_SECONDS", 60)),
+            poll_interval=float(app.config.get("CHART_QUEUE_POLL_INTERVAL", 1.0)),
+            cancel_poll_interval=float(app.config.get("CHART_CANCEL_POLL_INTERVAL", 1.0)),
+        )
+    raise ValueError(f"Unsupported queue backend: {backend}")
+
+
+class ChartProcessingWorker:
+    """后台任务处理池。
+
+    分发线程从队列领取任务、置为 ``PROCESSING`` 后交给分析后端（见
+    ``backend/utils/analyzers.py``），分析完成的回调把结果放入完成队列，由完成线程写回数据库。
+    在途任务数受 ``max_in_flight`` 信号量约束，信号量取得后才会领取新任务，因此处理池不会
+    领取超过自身处理能力的任务。本地同步分析时分发线程数等于并发度；异步后端只需一个分发线程。
+
+    每个在途任务登记一个 ``CancellationToken`` 与分析 ``Future``；``cancel`` 会置位标记并取消
+    ``Future``，名额在完成线程处理后立即释放。结果只通过条件更新（仍为 ``PROCESSING`` 且由
+    本进程持有）写回，已取消的任务不会被覆盖为完成。
+    """
+
+    def __init__(self) -> None:
+        self._queue: MemoryTaskQueue | DatabaseTaskQueue = MemoryTaskQueue()
+        self._analyzer: Optional[AnalyzerBackend] = None
+        # 停止时 _analyzer 置空，写回中的结果仍需使用启动时后端的版本
+        self._analyzer_version = ""
+        self._capacity = threading.BoundedSemaphore(1)
+        self._completed: "queue.Queue[Optional[tuple[TaskPayload, Future]]]" = queue.Queue()
+        self._retries = RetrySchedule()
+        self._inflight: dict[int, tuple[CancellationToken, Optional[Future]]] = {}
+        self._inflight_lock = threading.Lock()
+        self.max_attempts = 3
+        self.retry_base_delay = 2.0
+        self.retry_max_delay = 300.0
+        self._threads: list[threading.Thread] = []
+        self._stopping = threading.Event()
+        self._app: Optional[Flask] = None
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+    @property
+    def is_running(self) -> bool:
+        return any(thread.is_alive() for thread in self._threads)
+
+    def init_app(self, app: Flask) -> None:
+        """按配置选择任务队列但不启动任何线程；未运行处理池的 API 进程只负责入队。"""
+        if self.is_running:
+            return
+        task_queue = create_task_queue(app)
+        if not isinstance(task_queue, type(self._queue)):
+            self._queue = task_queue
+
+    def start(
+        self,
+        app: Flask,
+        concurrency: Optional[int] = None,
+        mode: Optional[str] = None,
+    ) -> None:
+        if self.is_running:
+            return
+
+        concurrency = max(1, int(concurrency or app.config.get("CHART_WORKER_CONCURRENCY", 1)))
+        mode = (mode or app.config.get("CHART_WORKER_MODE", "thread")).lower()
+        if mode not in WORKER_MODES:
+            raise ValueError(f"Unsupported worker mode: {mode}")
+
+        self.init_app(app)
+        self._app = app
+        self._stopping.clear()
+        if isinstance(self._queue, DatabaseTaskQueue):
+            self._queue.on_cancelled = self.cancel_many
+        self._queue.start(app, self.worker_id)
+
+        self.max_attempts = max(1, int(app.config.get("CHART_RETRY_MAX_ATTEMPTS", 3)))
+        self.retry_base_delay = float(app.config.get("CHART_RETRY_BASE_DELAY", 2.0))
+        self.retry_max_delay = float(app.config.get("CHART_RETRY_MAX_DELAY", 300.0))
+        # 经由属性投递：处理池重新启动、队列被替换后仍投递到当前队列
+        self._retries.start(lambda payload: self._queue.put(payload))
+
+        self._analyzer = create_analyzer(app.config, concurrency, mode)
+        self._analyzer.start()
+        self._analyzer_version = self._analyzer.version
+        self._capacity = threading.BoundedSemaphore(self._analyzer.max_in_flight)
+
+        dispatchers = self._analyzer.max_in_flight if self._analyzer.blocking else 1
+        self._threads = [
+            threading.Thread(
+                target=self._dispatch_loop,
+                args=(app,),
+                name=f"chart-worker-{index}",
+                daemon=True,
+            )
+            for index in range(dispatchers)
+        ]
+        self._threads.append(
+            threading.Thread(
+                target=self._complete_loop, args=(app,), name="chart-worker-results", daemon=True
+            )
+        )
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self, timeout: float = 30.0) -> int:
+        """停止领取新任务并等待在途任务完成，超过 ``timeout`` 秒仍未完成的任务取消后放回队列。
+
+        返回放回队列的任务数。
+        """
+        if self._app is None or not self.is_running:
+            return 0
+        self._stopping.set()
+        self._queue.close()
+        deadline = time.monotonic() + timeout
+        while self.in_flight and time.monotonic() < deadline:
+            time.sleep(0.1)
+        with self._inflight_lock:
+            unfinished = list(self._inflight)
+        self.cancel_many(unfinished)
+
+        with self._app.app_context():
+            try:
+                released = self._queue.release()
+            finally:
+                db.session.remove()
+        self._completed.put(None)
+        for thread in self._threads:
+            thread.join(timeout=5)
+        if self._analyzer is not None:
+            self._analyzer.shutdown()
+            self._analyzer = None
+        self._threads = []
+        return released
+
     def enqueue(self, payload: TaskPayload) -> None:
         self._queue.put(payload)
 
-    def _run(self, app: Flask) -> None:
+    def enqueue_many(self, payloads: list[TaskPayload]) -> None:
+        for payload in payloads:
+            self._queue.put(payload)
+
+    def cancel(self, task_id: int) -> bool:
+        """通知在途任务停止：置位取消标记并取消分析 Future，返回该任务是否在本进程中处理。"""
+        with self._inflight_lock:
+            entry = self._inflight.get(task_id)
+        if entry is None:
+            return False
+        token, future = entry
+        token.cancel()
+        if future is not None:
+            future.cancel()
+        return True
+
+    def cancel_many(self, task_ids: list[int]) -> None:
+        for task_id in task_ids:
+            self.cancel(task_id)
+
+    def _transition(self, task_id: int, values: dict) -> bool:
+        """仅当任务仍为 ``PROCESSING`` 且由本进程持有时更新状态并释放租约，返回是否更新成功。"""
+        values = {**values, ChartTask.locked_by: None, ChartTask.lease_expires_at: None}
+        updated = ChartTask.query.filter(
+            ChartTask.id == task_id,
+            ChartTask.status == TaskStatus.PROCESSING.value,
+            self._queue.ownership_clause(),
+        ).update(values, synchronize_session=False)
+        return bool(updated)
+
+    def _finish(self, payload: TaskPayload) -> None:
+        self._queue.task_done(payload)
+        self._capacity.release()
+
+    def _dispatch_loop(self, app: Flask) -> None:
         with app.app_context():
-            while True:
-                payload = self._queue.get()
+            while not self._stopping.is_set():
+                self._capacity.acquire()
                 try:
-                    task = ChartTask.query.get(payload.task_id)
-                    if not task:
-                        continue
-                    if task.status == TaskStatus.CANCELLED:
-                        continue
+                    payload = self._queue.get()
+                except QueueClosed:
+                    self._capacity.release()
+                    break
+                except Exception:  # pragma: no cover - database unavailable, retry later
+                    self._capacity.release()
+                    db.session.rollback()
+                    db.session.remove()
+                    time.sleep(1.0)
+                    continue
 
-                    task.status = TaskStatus.PROCESSING
-                    db.session.commit()
+                begin_started = time.perf_counter()
+                try:
+                    started = self._begin(payload)
+                except Exception:  # pragma: no cover - defensive
+                    db.session.rollback()
+                    started = False
+                finally:
+                    db.session.remove()
+                    observe_stage("begin", time.perf_counter() - begin_started)
+                if not started:
+                    self._finish(payload)
+                    continue
 
-                    result_payload = process_chart(
-                        payload.image_path, payload.public_image_url
+                token = CancellationToken()
+                with self._inflight_lock:
+                    self._inflight[payload.task_id] = (token, None)
+                submitted = time.perf_counter()
+                try:
+                    future = self._analyzer.submit(
+                        payload.image_path, payload.public_image_url, token
+                    )
+                except Exception as exc:
+                    future = Future()
+                    future.set_exception(exc)
+                with self._inflight_lock:
+                    self._inflight[payload.task_id] = (token, future)
+                if token.cancelled:
+                    # 登记 Future 之前收到的取消请求
+                    future.cancel()
+                future.add_done_callback(
+                    lambda done, payload=payload, submitted=submitted: self._analyzed(
+                        payload, done, submitted
                     )
+                )
 
-                    task_result = task.result or ChartTaskResult(task=task)
-                    if task.result is None:
-                        db.session.add(task_result)
-
-                    task_result.is_success = True
-                    task_result.summary = result_payload.get("summary")
-                    task_result.data_points = result_payload.get("data_points")
-                    task_result.table_data = result_payload.get("table_data")
-                    task_result.error_message = None
-
-                    task.status = TaskStatus.COMPLETED
-                    db.session.commit()
-                except Exception as exc:  # pragma: no cover - defensive logging
-                    task = ChartTask.query.get(payload.task_id)
-                    if task:
-                        task.status = TaskStatus.FAILED
-                        task_result = task.result or ChartTaskResult(task=task)
-                        if task.result is None:
-                            db.session.add(task_result)
-                        task_result.is_success = False
-                        task_result.error_message = str(exc)
-                        task_result.summary = None
-                        task_result.data_points = None
-                        task_result.table_data = None
-                        db.session.commit()
+    def _analyzed(self, payload: TaskPayload, future: Future, submitted: float) -> None:
+        observe_stage("analyze", time.perf_counter() - submitted)
+        self._completed.put((payload, future))
+
+    def _complete_loop(self, app: Flask) -> None:
+        with app.app_context():
+            while True:
+                item = self._completed.get()
+                if item is None:
+                    break
+                payload, future = item
+                with self._inflight_lock:
+                    self._inflight.pop(payload.task_id, None)
+                started = time.perf_counter()
+                try:
+                    self._complete(payload, future)
                 finally:
-                    self._queue.task_done()
+                    db.session.remove()
+                    self._finish(payload)
+                    observe_stage("complete", time.perf_counter() - started)
+
+    def _begin(self, payload: TaskPayload) -> bool:
+        # 与 _transition 一样用条件更新：读取与写入之间提交的取消不会被覆盖
+        started = ChartTask.query.filter(
+            ChartTask.id == payload.task_id,
+            ChartTask.status.in_((TaskStatus.QUEUED.value, TaskStatus.PROCESSING.value)),
+            self._queue.ownership_clause(),
+        ).update(
+            {
+                ChartTask.status: TaskStatus.PROCESSING.value,
+                ChartTask.attempts: db.func.coalesce(ChartTask.attempts, 0) + 1,
+                ChartTask.next_attempt_at: None,
+            },
+            synchronize_session=False,
+        )
+        db.session.commit()
+        if not started:
+            return False
+        broker.publish_task(ChartTask.query.get(payload.task_id))
+        return True
+
+    def _complete(self, payload: TaskPayload, future: Future) -> None:
+        try:
+            result_payload = future.result()
+
+            # 条件更新失败说明任务已被取消，或租约过期后已被其他进程重新领取，此时放弃写回
+            if not self._transition(payload.task_id, {ChartTask.status: TaskStatus.COMPLETED.value}):
+                db.session.rollback()
+                task_outcomes.inc(outcome="discarded")
+                return
+
+            task = ChartTask.query.get(payload.task_id)
+            task_result = task.result
+            if task_result is None:
+                task_result = ChartTaskResult(task=task)
+                db.session.add(task_result)
+
+            task_result.is_success = True
+            task_result.summary = result_payload.get("summary")
+            task_result.set_chart_data(
+                result_payload.get("data_points"), result_payload.get("table_data")
+            )
+            task_result.error_message = None
+            task_result.processor_version = self._analyzer_version
+            db.session.commit()
+            task_outcomes.inc(outcome="completed")
+            broker.publish_task(task)
+        except (CancelledError, TaskCancelled):
+            db.session.rollback()
+            task_outcomes.inc(outcome="cancelled")
+        except Exception as exc:
+            db.session.rollback()
+            self._handle_failure(payload, str(exc) or type(exc).__name__)
+
+    def _handle_failure(self, payload: TaskPayload, error: str) -> None:
+        """未用尽次数时退回 ``QUEUED`` 并按退避时间延迟重试，保留已有结果；否则进入死信（FAILED）。"""
+        task = ChartTask.query.get(payload.task_id)
+        if task is None:
+            return
+        attempts = task.attempts or 1
+        if attempts < self.max_attempts:
+            delay = retry_delay(attempts, self.retry_base_delay, self.retry_max_delay)
+            retried = self._transition(
+                payload.task_id,
+                {
+                    ChartTask.status: TaskStatus.QUEUED.value,
+                    ChartTask.next_attempt_at: datetime.utcnow() + timedelta(seconds=delay),
+                },
+            )
+            db.session.commit()
+            if retried:
+                task_outcomes.inc(outcome="retried")
+                broker.publish_task(task)
+                self._retries.schedule(payload, delay)
+            return
+
+        if not self._transition(
+            payload.task_id,
+            {ChartTask.status: TaskStatus.FAILED.value, ChartTask.next_attempt_at: None},
+        ):
+            db.session.rollback()
+            return
+        db.session.refresh(task)
+        task_result = task.result
+        if task_result is None:
+            task_result = ChartTaskResult(task=task)
+            db.session.add(task_result)
+        task_result.is_success = False
+        task_result.error_message = error
+        task_result.summary = None
+        task_result.set_chart_data(None, None)
+        db.session.commit()
+        task_outcomes.inc(outcome="failed")
+        broker.publish_task(task)
+
+    def queue_depth(self) -> int:
+        return self._queue.depth()
+
+    @property
+    def in_flight(self) -> int:
+        with self._inflight_lock:
+            return len(self._inflight)
+
+    @property
+    def retries_scheduled(self) -> int:
+        return len(self._retries)
 
 
 worker = ChartProcessingWorker()
+
+registry.gauge("chart_queue_depth", "Tasks waiting to be claimed.", worker.queue_depth)
+registry.gauge("chart_tasks_in_flight", "Tasks currently being analyzed.", lambda: worker.in_flight)
+registry.gauge(
+    "chart_retries_scheduled", "Failed tasks waiting for a delayed retry.", lambda: worker.retries_scheduled
+)
@@ -0,0 +1,124 @@
+"""本地替身分析服务，实现与远程分析服务相同的 HTTP 协议，供联调与压测使用。
+
+启动方式::
+
+    python -m backend.utils.analyzer_stub --port 8765 --upload-folder backend/uploads --delay 0.2
+
+然后设置 ``CHART_ANALYZER_BACKEND=http``、``CHART_ANALYZER_URL=http://127.0.0.1:8765/analyze``。
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Optional
+from urllib.parse import unquote, urlparse
+
+from .chart_processing import process_chart
+
+
+class _AnalyzerHandler(BaseHTTPRequestHandler):
+    server: "StubAnalyzerServer"
+    protocol_version = "HTTP/1.1"  # 保持连接，便于客户端复用
+
+    def do_POST(self) -> None:  # noqa: N802 - BaseHTTPRequestHandler 约定
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+            image_url = body["image_url"]
+        except (ValueError, KeyError):
+            self._respond(400, {"message": "image_url is required"})
+            return
+
+        if self.server.delay:
+            time.sleep(self.server.delay)
+        try:
+            payload = process_chart(self.server.resolve(image_url), image_url)
+        except Exception as exc:  # pragma: no cover - 透传分析错误
+            self._respond(500, {"message": str(exc)})
+            return
+        self._respond(200, payload)
+
+    def _respond(self, status: int, payload: dict) -> None:
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        try:
+            self.wfile.write(data)
+        except (BrokenPipeError, ConnectionResetError):
+            # 客户端已取消请求
+            self.close_connection = True
+
+    def log_message(self, format: str, *args) -> None:  # noqa: A002
+        del format, args
+
+
+class StubAnalyzerServer(ThreadingHTTPServer):
+    """``POST /analyze``，请求体 ``{"image_url": ...}``，返回 ``process_chart`` 的结果。
+
+    设置 ``upload_folder`` 时按图片地址的文件名在该目录下读取图片，否则把地址当作本地路径；
+    ``delay`` 用于模拟远程服务的网络与推理耗时。
+    """
+
+    daemon_threads = True
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        upload_folder: Optional[str] = None,
+        delay: float = 0.0,
+    ) -> None:
+        super().__init__((host, port), _AnalyzerHandler)
+        self.upload_folder = upload_folder
+        self.delay = delay
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/analyze"
+
+    def resolve(self, image_url: str) -> str:
+        path = unquote(urlparse(image_url).path)
+        if self.upload_folder:
+            return str(Path(self.upload_folder) / Path(path).name)
+        return path
+
+    def start_background(self) -> "StubAnalyzerServer":
+        self._thread = threading.Thread(
+            target=self.serve_forever, name="chart-analyzer-stub", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="本地替身图表分析服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--upload-folder", default=None)
+    parser.add_argument("--delay", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = StubAnalyzerServer(args.host, args.port, args.upload_folder, args.delay)
+    print(f"Stub analyzer listening on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:  # pragma: no cover
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Optional
+
+try:
+    import httpx
+except ImportError:  # pragma: no cover - 仅 http 分析后端需要
+    httpx = None
+
+from .chart_processing import PROCESSOR_VERSION, CancellationToken, process_chart
+
+
+class AnalyzerBackend:
+    """图表分析后端接口。
+
+    ``submit`` 立即返回 ``concurrent.futures.Future``，结果为与 ``process_chart``
+    相同结构的字典。任务被取消时处理池会置位 ``cancel_token`` 并调用 ``Future.cancel()``，
+    后端应尽快放弃对应的工作；处理池据此决定同时有多少任务在途（``max_in_flight``）。``blocking`` 为真
+    表示 ``submit`` 会在调用线程内完成分析，处理池需要按并发度启动同等数量的分发线程。
+    ``version`` 写入结果的 ``processor_version``，上传去重只复用同一版本产生的结果。
+    """
+
+    max_in_flight: int = 1
+    blocking: bool = False
+    version: str = PROCESSOR_VERSION
+
+    def start(self) -> None:
+        """在处理池启动时调用，用于创建线程、事件循环或连接池。"""
+
+    def submit(
+        self,
+        image_path: str,
+        public_image_url: str,
+        cancel_token: Optional[CancellationToken] = None,
+    ) -> "Future[dict[str, Any]]":
+        raise NotImplementedError
+
+    def shutdown(self) -> None:
+        """处理池停止时调用。"""
+
+
+class LocalAnalyzer(AnalyzerBackend):
+    """在本机执行 ``process_chart``：``thread`` 模式在调用线程内同步执行，并在各阶段之间
+    检查取消标记；``process`` 模式交给进程池执行，取消只能撤下尚未开始的任务。"""
+
+    def __init__(self, concurrency: int = 1, use_processes: bool = False) -> None:
+        self.max_in_flight = concurrency
+        self._use_processes = use_processes
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    @property
+    def blocking(self) -> bool:
+        return not self._use_processes
+
+    def start(self) -> None:
+        if self._use_processes and self._executor is None:
+            # 使用 spawn 避免在已有线程的进程中 fork 带来的锁状态问题
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_in_flight, mp_context=multiprocessing.get_context("spawn")
+            )
+
+    def submit(
+        self,
+        image_path: str,
+        public_image_url: str,
+        cancel_token: Optional[CancellationToken] = None,
+    ) -> "Future[dict[str, Any]]":
+        if self._executor is not None:
+            # 取消标记无法跨进程传递，进程池中的任务依赖 Future.cancel()
+            return self._executor.submit(process_chart, image_path, public_image_url)
+        future: "Future[dict[str, Any]]" = Future()
+        try:
+            future.set_result(process_chart(image_path, public_image_url, cancel_token))
+        except Exception as exc:
+            future.set_exception(exc)
+        return future
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+class AsyncHTTPAnalyzer(AnalyzerBackend):
+    """调用远程分析服务的异步后端。
+
+    独立线程运行一个事件循环，所有请求共享同一个 ``httpx.AsyncClient`` 连接池；
+    信号量限制同时在途的请求数，每个请求有独立超时。请求体为
+    ``{"image_url": ...}``，响应体为 ``process_chart`` 结构的 JSON。取消 ``Future`` 会取消
+    对应的协程，正在等待名额或响应的请求立即中止并释放连接。
+    """
+
+    def __init__(
+        self, endpoint: str, max_in_flight: int = 32, timeout: float = 30.0, version: str = ""
+    ) -> None:
+        if httpx is None:
+            raise RuntimeError("The http analyzer backend requires the 'httpx' package.")
+        self.endpoint = endpoint
+        self.version = http_analyzer_version(version)
+        self.max_in_flight = max_in_flight
+        self.timeout = timeout
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._client: Optional["httpx.AsyncClient"] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._ready = threading.Event()
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._run_loop, name="chart-analyzer-loop", daemon=True
+        )
+        self._thread.start()
+        self._ready.wait()
+
+    def _run_loop(self) -> None:
+        asyncio.set_event_loop(self._loop)
+        self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        self._client = httpx.AsyncClient(
+            timeout=self.timeout,
+            limits=httpx.Limits(
+                max_connections=self.max_in_flight,
+                max_keepalive_connections=self.max_in_flight,
+            ),
+        )
+        self._ready.set()
+        self._loop.run_forever()
+
+    async def _analyze(self, public_image_url: str) -> dict[str, Any]:
+        async with self._semaphore:
+            response = await asyncio.wait_for(
+                self._client.post(self.endpoint, json={"image_url": public_image_url}),
+                timeout=self.timeout,
+            )
+            response.raise_for_status()
+            return response.json()
+
+    def submit(
+        self,
+        image_path: str,
+        public_image_url: str,
+        cancel_token: Optional[CancellationToken] = None,
+    ) -> "Future[dict[str, Any]]":
+        del image_path, cancel_token  # 远程服务通过公开地址拉取图片；取消通过 Future.cancel()
+        if self._loop is None:
+            raise RuntimeError("Analyzer backend has not been started.")
+        return asyncio.run_coroutine_threadsafe(self._analyze(public_image_url), self._loop)
+
+    def shutdown(self) -> None:
+        if self._loop is None:
+            return
+        if self._client is not None:
+            asyncio.run_coroutine_threadsafe(self._client.aclose(), self._loop).result(timeout=5)
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._loop = None
+
+
+def http_analyzer_version(version: str) -> str:
+    return f"http:{version}" if version else "http"
+
+
+def analyzer_version(config: dict[str, Any]) -> str:
+    """按配置返回当前分析后端写入结果的版本，无需创建后端（API 进程查找可复用结果时使用）。"""
+    if config.get("CHART_ANALYZER_BACKEND", "local").lower() == "http":
+        return http_analyzer_version(config.get("CHART_ANALYZER_VERSION", ""))
+    return PROCESSOR_VERSION
+
+
+def create_analyzer(config: dict[str, Any], concurrency: int, mode: str) -> AnalyzerBackend:
+    backend = config.get("CHART_ANALYZER_BACKEND", "local").lower()
+    if backend == "local":
+        return LocalAnalyzer(concurrency=concurrency, use_processes=mode == "process")
+    if backend == "http":
+        endpoint = config.get("CHART_ANALYZER_URL")
+        if not endpoint:
+            raise ValueError("CHART_ANALYZER_URL is required for the http analyzer backend")
+        return AsyncHTTPAnalyzer(
+            endpoint,
+            max_in_flight=int(config.get("CHART_ANALYZER_MAX_IN_FLIGHT", 32)),
+            timeout=float(config.get("CHART_ANALYZER_TIMEOUT", 30.0)),
+            version=config.get("CHART_ANALYZER_VERSION", ""),
+        )
+    raise ValueError(f"Unsupported analyzer backend: {backend}")
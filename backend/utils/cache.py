@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from typing import Callable, Generic, Hashable, Optional, TypeVar
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+_MISSING = object()
+
+
+class LRUCache(Generic[K, V]):
+    """线程安全的定长 LRU 缓存。
+
+    给定 ``weigher`` 时 ``maxsize`` 限制的是各条目权重（如字节数）之和，而不是条目数；
+    单个超过上限的值不缓存。
+    """
+
+    def __init__(self, maxsize: int = 256, weigher: Optional[Callable[[V], int]] = None) -> None:
+        self.maxsize = maxsize
+        self._weigher = weigher
+        self._data: "OrderedDict[K, V]" = OrderedDict()
+        self._weights: dict[K, int] = {}
+        self.weight = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: K) -> Optional[V]:
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: K, value: V) -> None:
+        weight = self._weigher(value) if self._weigher is not None else 1
+        if self.maxsize <= 0 or weight > self.maxsize:
+            return
+        with self._lock:
+            self._pop(key)
+            self._data[key] = value
+            self._weights[key] = weight
+            self.weight += weight
+            while self.weight > self.maxsize:
+                self._pop(next(iter(self._data)))
+
+    def _pop(self, key: K) -> None:
+        if self._data.pop(key, _MISSING) is not _MISSING:
+            self.weight -= self._weights.pop(key)
+
+    def invalidate(self, predicate: Callable[[K], bool]) -> int:
+        with self._lock:
+            stale = [key for key in self._data if predicate(key)]
+            for key in stale:
+                self._pop(key)
+            return len(stale)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._weights.clear()
+            self.weight = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
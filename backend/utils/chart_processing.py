@@ -1,16 +1,154 @@
 from __future__ import annotations
 
+import hashlib
+import os
 import random
+import threading
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Any
+from typing import Any, Optional
 
-from PIL import Image
+from PIL import Image, ImageOps
 
+from ..metrics import stage_duration
+from .cache import LRUCache
 
-def simulate_cloud_processing(image_path: str) -> dict[str, Any]:
-    """模拟外部服务对图表图片进行解析。"""
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy 缺失时退回逐点实现
+    np = None
+
+# 分析逻辑的输出发生变化时递增，结果缓存只复用同一版本生成的结果
+PROCESSOR_VERSION = "numpy-2" if np is not None else "simulate-1"
+
+# 向量化分析按图片宽度决定数据点数量：每隔 POINT_SPACING_PX 像素一个点
+POINT_SPACING_PX = 8
+MIN_POINT_COUNT = 5
+MAX_POINT_COUNT = 10_000
+
+# 分析所需的最长边：解码时直接缩放到该尺寸附近，避免完整解码大图
+ANALYSIS_MAX_SIDE = 1024
+# 列内灰度差小于该值视为没有可识别的曲线，退回按种子生成的数值
+MIN_COLUMN_CONTRAST = 32
+
+_EXIF_ORIENTATION = 0x0112
+# 这些方向需要旋转 90°，校正后宽高互换
+_TRANSPOSED_ORIENTATIONS = {5, 6, 7, 8}
+
+
+class TaskCancelled(Exception):
+    """分析过程中检测到任务已被取消。"""
+
+
+class CancellationToken:
+    """协作式取消标记：处理池在任务被取消时置位，分析函数在各阶段之间检查。"""
+
+    def __init__(self) -> None:
+        self._event = threading.Event()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self) -> None:
+        self._event.set()
+
+    def raise_if_cancelled(self) -> None:
+        if self._event.is_set():
+            raise TaskCancelled()
+
+
+def _fit_within(size: tuple[int, int], max_side: int) -> tuple[int, int]:
+    width, height = size
+    ratio = min(1.0, max_side / max(width, height, 1))
+    return max(1, round(width * ratio)), max(1, round(height * ratio))
+
+
+def _to_grayscale(image: Image.Image) -> Image.Image:
+    """统一转为灰度；带透明通道的图片先铺白底，避免透明区域变黑。"""
+    if image.mode == "L":
+        return image
+    if image.mode in {"RGBA", "LA"} or (image.mode == "P" and "transparency" in image.info):
+        rgba = image.convert("RGBA")
+        background = Image.new("RGB", rgba.size, (255, 255, 255))
+        background.paste(rgba, mask=rgba.getchannel("A"))
+        image = background
+    return image.convert("L")
+
+
+@dataclass(frozen=True)
+class PreparedImage:
+    """预处理阶段的产物：按 EXIF 方向校正、缩放到分析尺寸的灰度图，以及校正后的原图尺寸。"""
+
+    path: str
+    width: int
+    height: int
+    image: Image.Image
+
+    @property
+    def size(self) -> tuple[int, int]:
+        return self.width, self.height
+
+    @property
+    def nbytes(self) -> int:
+        return self.image.width * self.image.height * len(self.image.getbands())
+
+
+def _decode(image_path: str, max_side: int) -> PreparedImage:
+    with Image.open(image_path) as source:
+        width, height = source.size
+        if source.getexif().get(_EXIF_ORIENTATION, 1) in _TRANSPOSED_ORIENTATIONS:
+            width, height = height, width
+        if source.format == "JPEG":
+            # JPEG 可在 DCT 阶段按 1/2、1/4、1/8 缩放并直接解码为灰度
+            source.draft("L", _fit_within(source.size, max_side))
+        image = ImageOps.exif_transpose(source)
+
+    target = _fit_within(image.size, max_side)
+    factor = min(image.width // target[0], image.height // target[1])
+    if factor > 1:
+        image = image.reduce(factor)
+    if image.width > target[0] or image.height > target[1]:
+        image = image.resize(target, Image.Resampling.BILINEAR)
+    return PreparedImage(path=image_path, width=width, height=height, image=_to_grayscale(image))
+
+
+# 按灰度图的字节数计量，约可容纳 64 张最长边 1024 的图片
+prepared_image_cache: LRUCache[tuple, PreparedImage] = LRUCache(
+    maxsize=64 * 1024 * 1024, weigher=lambda prepared: prepared.nbytes
+)
+
+
+def prepare_chart_image(image_path: str, max_side: int = ANALYSIS_MAX_SIDE) -> PreparedImage:
+    """图片预处理阶段：解码、校正方向并转为灰度，按文件版本缓存，重试或重新分析时无需重新解码。"""
+    stat = os.stat(image_path)
+    key = (os.path.abspath(image_path), stat.st_mtime_ns, stat.st_size, max_side)
+    prepared = prepared_image_cache.get(key)
+    if prepared is not None:
+        return prepared
+    with stage_duration.time(stage="decode"):
+        prepared = _decode(image_path, max_side)
+    prepared_image_cache.put(key, prepared)
+    return prepared
+
+
+def read_chart_size(image_path: str) -> tuple[int, int]:
+    """只读取文件头，返回按 EXIF 方向校正后的原图尺寸。"""
     with Image.open(image_path) as image:
         width, height = image.size
+        if image.getexif().get(_EXIF_ORIENTATION, 1) in _TRANSPOSED_ORIENTATIONS:
+            width, height = height, width
+    return width, height
+
+
+def simulate_cloud_processing(
+    image_path: str, cancel_token: Optional[CancellationToken] = None
+) -> dict[str, Any]:
+    """模拟外部服务对图表图片进行解析。"""
+    with stage_duration.time(stage="prepare"):
+        width, height = read_chart_size(image_path)
+    if cancel_token is not None:
+        cancel_token.raise_if_cancelled()
     random.seed(Path(image_path).name)
 
     summary = "自动生成的图表摘要"
@@ -47,6 +185,114 @@ def simulate_cloud_processing(image_path: str) -> dict[str, Any]:
     }
 
 
-def process_chart(image_path: str, public_image_url: str) -> dict[str, Any]:
+@dataclass
+class ChartAnalysis:
+    """向量化分析的中间结果：各字段以数组保存，序列化时才展开为逐点字典。"""
+
+    summary: str
+    values: "np.ndarray"
+    x_percent: "np.ndarray"
+    y_percent: "np.ndarray"
+    x_pixel: "np.ndarray"
+    y_pixel: "np.ndarray"
+
+    @property
+    def point_count(self) -> int:
+        return int(self.values.shape[0])
+
+    def to_payload(self) -> dict[str, Any]:
+        values = self.values.tolist()
+        labels = [f"数据点 {index}" for index in range(1, len(values) + 1)]
+        data_points = [
+            {
+                "id": index,
+                "label": label,
+                "value": value,
+                "x_percent": x_percent,
+                "y_percent": y_percent,
+                "x_pixel": x_pixel,
+                "y_pixel": y_pixel,
+                "description": f"第 {index} 个数据点的数值为 {value}。",
+            }
+            for index, label, value, x_percent, y_percent, x_pixel, y_pixel in zip(
+                range(1, len(values) + 1),
+                labels,
+                values,
+                self.x_percent.tolist(),
+                self.y_percent.tolist(),
+                self.x_pixel.tolist(),
+                self.y_pixel.tolist(),
+            )
+        ]
+        table_data = [{"label": label, "value": value} for label, value in zip(labels, values)]
+        return {
+            "summary": self.summary,
+            "data_points": data_points,
+            "table_data": table_data,
+        }
+
+
+def _trace_values(pixels: "np.ndarray", x_percent: "np.ndarray", fallback: "np.ndarray") -> "np.ndarray":
+    """在各数据点对应的列中取最暗像素的高度作为数值；列内没有明显曲线时保留 ``fallback``。"""
+    rows, columns = pixels.shape
+    sampled = pixels[:, np.round(x_percent / 100 * (columns - 1)).astype(np.intp)]
+    contrast = sampled.max(axis=0).astype(np.int16) - sampled.min(axis=0)
+    height_percent = 100 - sampled.argmin(axis=0) / max(rows - 1, 1) * 100
+    traced = np.clip(np.rint(height_percent), 10, 100).astype(fallback.dtype)
+    return np.where(contrast >= MIN_COLUMN_CONTRAST, traced, fallback)
+
+
+def analyze_chart_dimensions(
+    width: int, height: int, seed: str, pixels: Optional["np.ndarray"] = None
+) -> ChartAnalysis:
+    """根据图片尺寸一次性计算所有数据点的数值、百分比与像素坐标。
+
+    传入分析尺寸的灰度像素 ``pixels`` 时按列追踪曲线取值，否则数值按 ``seed`` 生成。
+    """
+    point_count = max(MIN_POINT_COUNT, min(MAX_POINT_COUNT, width // POINT_SPACING_PX))
+    rng = np.random.default_rng(int.from_bytes(hashlib.sha256(seed.encode()).digest()[:8], "big"))
+
+    values = rng.integers(10, 101, size=point_count)
+    x_percent = np.round(np.arange(point_count) / max(point_count - 1, 1) * 100, 2)
+    if pixels is not None:
+        values = _trace_values(pixels, x_percent, values)
+    y_percent = np.round(100 - values.astype(np.float64), 2)
+    return ChartAnalysis(
+        summary="自动生成的图表摘要",
+        values=values,
+        x_percent=x_percent,
+        y_percent=y_percent,
+        x_pixel=np.round(x_percent / 100 * width, 2),
+        y_pixel=np.round(y_percent / 100 * height, 2),
+    )
+
+
+def vectorized_cloud_processing(
+    image_path: str, cancel_token: Optional[CancellationToken] = None
+) -> dict[str, Any]:
+    check = cancel_token.raise_if_cancelled if cancel_token is not None else lambda: None
+    with stage_duration.time(stage="prepare"):
+        prepared = prepare_chart_image(image_path)
+    check()
+    with stage_duration.time(stage="analysis"):
+        analysis = analyze_chart_dimensions(
+            prepared.width, prepared.height, Path(image_path).name, np.asarray(prepared.image)
+        )
+    check()
+    with stage_duration.time(stage="serialize"):
+        return analysis.to_payload()
+
+
+def process_chart(
+    image_path: str,
+    public_image_url: str,
+    cancel_token: Optional[CancellationToken] = None,
+) -> dict[str, Any]:
+    """分析图表图片。传入 ``cancel_token`` 时在预处理、分析、序列化各阶段之间检查取消，
+    已取消则抛出 ``TaskCancelled``。"""
     del public_image_url  # 当前实现不依赖公开地址，保留参数以兼容调用
-    return simulate_cloud_processing(image_path)
+    if cancel_token is not None:
+        cancel_token.raise_if_cancelled()
+    if np is not None:
+        return vectorized_cloud_processing(image_path, cancel_token)
+    return simulate_cloud_processing(image_path, cancel_token)
@@ -0,0 +1,35 @@
+"""按端点设置请求体大小上限。
+
+Flask 3.0 的 ``request.max_content_length`` 只读取全局的 ``MAX_CONTENT_LENGTH``。批量导入
+需要比单张上传大得多的请求体，用 ``body_limit`` 标记视图，``LimitedRequest`` 解析表单时
+改用该视图声明的配置项。
+"""
+from __future__ import annotations
+
+from typing import Callable, Optional
+
+from flask import Request, current_app
+
+_ATTRIBUTE = "max_content_length_config"
+
+
+def body_limit(config_key: str) -> Callable:
+    """视图的请求体上限改取 ``config_key`` 配置项（需放在 ``jwt_required`` 等装饰器之下）。"""
+
+    def decorator(view: Callable) -> Callable:
+        setattr(view, _ATTRIBUTE, config_key)
+        return view
+
+    return decorator
+
+
+class LimitedRequest(Request):
+    @property
+    def max_content_length(self) -> Optional[int]:  # type: ignore[override]
+        if not current_app:
+            return None
+        config_key = "MAX_CONTENT_LENGTH"
+        if self.endpoint is not None:
+            view = current_app.view_functions.get(self.endpoint)
+            config_key = getattr(view, _ATTRIBUTE, config_key)
+        return current_app.config.get(config_key)
@@ -0,0 +1,204 @@
+"""图表结果（数据点、表格数据）的紧凑列式编码。
+
+逐点 JSON 每一行都重复 ``label``、``x_percent``、``description`` 等键名，数据点越多
+键名占比越高。这里把结构相同的字典列表拆成按列存放的定长数组，字符串统一放进字符串表
+（``data_points`` 与 ``table_data`` 共用，标签只存一份），体积较大时再整体 zlib 压缩。
+
+二进制布局::
+
+    b"ACR" | 版本 (1 字节) | 标志 (1 字节) | 正文（标志含 FLAG_ZLIB 时为压缩后的正文）
+    正文 = 元数据长度 (uint32) | 元数据 (UTF-8 JSON) | 各列数组（小端序，按字段、列的顺序）
+
+元数据记录字符串表和每个字段的行数与列定义，解码时可只展开需要的字段。无法按列存放的
+列表（各行键不一致、值为嵌套结构等）整体保存在元数据里，保证任意 JSON 都能原样往返。
+"""
+from __future__ import annotations
+
+import json
+import struct
+import sys
+import zlib
+from array import array
+from typing import Any, Iterable, Optional
+
+MAGIC = b"ACR"
+FORMAT_VERSION = 1
+FLAG_ZLIB = 0x01
+# 正文小于该字节数时压缩收益有限，直接存放
+COMPRESS_THRESHOLD = 512
+
+_HEADER = struct.Struct("<3sBB")
+_META_LENGTH = struct.Struct("<I")
+_INT64_RANGE = range(-(2**63), 2**63)
+
+# 列类型：整数、浮点数、字符串（字符串表下标）、布尔值
+_TYPECODES = {"i": "q", "f": "d", "s": "I", "b": "B"}
+
+
+class ResultCodecError(ValueError):
+    """编码数据损坏或版本不受支持。"""
+
+
+def _column_kind(values: list[Any]) -> Optional[str]:
+    """判断一列能否用定长数组保存；混合类型、空值等返回 ``None``。"""
+    kinds = {type(value) for value in values}
+    if kinds == {bool}:
+        return "b"
+    if kinds == {int}:
+        return "i" if all(value in _INT64_RANGE for value in values) else None
+    if kinds == {float}:
+        return "f"
+    if kinds == {str}:
+        return "s"
+    return None
+
+
+def _to_bytes(typecode: str, values: Iterable[Any]) -> bytes:
+    packed = array(typecode, values)
+    if sys.byteorder == "big":  # pragma: no cover - 统一按小端序存储
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def _from_bytes(typecode: str, data: bytes) -> list[Any]:
+    packed = array(typecode)
+    packed.frombytes(data)
+    if sys.byteorder == "big":  # pragma: no cover
+        packed.byteswap()
+    return packed.tolist()
+
+
+class _Encoder:
+    def __init__(self) -> None:
+        self.strings: list[str] = []
+        self._string_index: dict[str, int] = {}
+        self.chunks: list[bytes] = []
+
+    def _intern(self, value: str) -> int:
+        index = self._string_index.get(value)
+        if index is None:
+            index = self._string_index[value] = len(self.strings)
+            self.strings.append(value)
+        return index
+
+    def field(self, records: Any) -> Any:
+        if records is None:
+            return None
+        if not isinstance(records, list) or not all(isinstance(row, dict) for row in records):
+            return {"json": records}
+        keys = list(records[0]) if records else []
+        if any(list(row) != keys for row in records):
+            return {"json": records}
+
+        columns: list[list[Any]] = []
+        for key in keys:
+            values = [row[key] for row in records]
+            kind = _column_kind(values)
+            if kind is None:
+                # 单列无法定长存放时仅该列退回 JSON，其余列仍按数组保存
+                columns.append([key, "j", values])
+                continue
+            if kind == "s":
+                values = [self._intern(value) for value in values]
+            self.chunks.append(_to_bytes(_TYPECODES[kind], values))
+            columns.append([key, kind])
+        return {"rows": len(records), "columns": columns}
+
+
+def encode_chart_data(fields: dict[str, Any], compress: bool = True) -> bytes:
+    """把 ``{"data_points": [...], "table_data": [...]}`` 等字段编码为一个二进制块。"""
+    encoder = _Encoder()
+    specs = {name: encoder.field(records) for name, records in fields.items()}
+    meta = json.dumps(
+        {"strings": encoder.strings, "fields": specs},
+        ensure_ascii=False,
+        separators=(",", ":"),
+    ).encode("utf-8")
+    body = b"".join([_META_LENGTH.pack(len(meta)), meta, *encoder.chunks])
+
+    flags = 0
+    if compress and len(body) >= COMPRESS_THRESHOLD:
+        compressed = zlib.compress(body, 6)
+        if len(compressed) < len(body):
+            body, flags = compressed, FLAG_ZLIB
+    return _HEADER.pack(MAGIC, FORMAT_VERSION, flags) + body
+
+
+class DecodedChartData:
+    """已解析头部与元数据的编码块，字段在首次访问时才展开为字典列表。"""
+
+    def __init__(self, blob: bytes) -> None:
+        if len(blob) < _HEADER.size:
+            raise ResultCodecError("chart data blob is truncated")
+        magic, version, flags = _HEADER.unpack_from(blob)
+        if magic != MAGIC:
+            raise ResultCodecError("not an encoded chart data blob")
+        if version != FORMAT_VERSION:
+            raise ResultCodecError(f"unsupported chart data format version {version}")
+
+        body = memoryview(blob)[_HEADER.size :]
+        if flags & FLAG_ZLIB:
+            body = memoryview(zlib.decompress(body))
+        (meta_length,) = _META_LENGTH.unpack_from(body)
+        meta_end = _META_LENGTH.size + meta_length
+        meta = json.loads(bytes(body[_META_LENGTH.size : meta_end]).decode("utf-8"))
+
+        self._strings: list[str] = meta["strings"]
+        self._specs: dict[str, Any] = meta["fields"]
+        self._decoded: dict[str, Any] = {}
+        # 各字段数组在正文中的位置：按编码时的字段、列顺序依次排列
+        self._slices: dict[str, memoryview] = {}
+        offset = meta_end
+        for name, spec in self._specs.items():
+            size = 0
+            if spec and "rows" in spec:
+                for column in spec["columns"]:
+                    if column[1] != "j":
+                        size += spec["rows"] * array(_TYPECODES[column[1]]).itemsize
+            self._slices[name] = body[offset : offset + size]
+            offset += size
+        if offset != len(body):
+            raise ResultCodecError("chart data blob length does not match its metadata")
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._specs
+
+    def get(self, name: str) -> Any:
+        if name not in self._decoded:
+            self._decoded[name] = self._decode_field(name)
+        return self._decoded[name]
+
+    def _decode_field(self, name: str) -> Any:
+        spec = self._specs.get(name)
+        if spec is None:
+            return None
+        if "json" in spec:
+            return spec["json"]
+
+        rows = spec["rows"]
+        data = self._slices[name]
+        keys: list[str] = []
+        columns: list[list[Any]] = []
+        offset = 0
+        for column in spec["columns"]:
+            key, kind = column[0], column[1]
+            keys.append(key)
+            if kind == "j":
+                columns.append(column[2])
+                continue
+            size = rows * array(_TYPECODES[kind]).itemsize
+            values = _from_bytes(_TYPECODES[kind], data[offset : offset + size])
+            offset += size
+            if kind == "s":
+                strings = self._strings
+                values = [strings[index] for index in values]
+            elif kind == "b":
+                values = [bool(value) for value in values]
+            columns.append(values)
+        if not keys:
+            return [{} for _ in range(rows)]
+        return [dict(zip(keys, row)) for row in zip(*columns)]
+
+
+def decode_chart_data(blob: bytes) -> DecodedChartData:
+    return DecodedChartData(blob)
@@ -1,11 +1,22 @@
 from __future__ import annotations
 
 import json
-from typing import List
+import sys
+from string import Formatter
+from typing import Any, Hashable, List, Optional
 
 from ..models import ChartTask, CodeTemplate
+from .cache import LRUCache
 
 REQUIRED_TEMPLATE_PLACEHOLDERS = {"{title}", "{summary}", "{table_data}", "{data_points}"}
+TEMPLATE_CONTEXT_KEYS = {"title", "summary", "table_data", "data_points", "image_url"}
+
+compiled_template_cache: LRUCache[Hashable, "CompiledTemplate"] = LRUCache(maxsize=256)
+# 渲染结果大小差异很大（与数据点数量成正比），按占用字节数而非条目数限制
+RENDERED_OUTPUT_CACHE_BYTES = 32 * 1024 * 1024
+rendered_output_cache: LRUCache[Hashable, str] = LRUCache(
+    maxsize=RENDERED_OUTPUT_CACHE_BYTES, weigher=sys.getsizeof
+)
 
 
 class _SafeTemplateContext(dict):
@@ -13,25 +24,88 @@ class _SafeTemplateContext(dict):
         return ""
 
 
+class CompiledTemplate:
+    """预先解析过的模板。
+
+    模板只引用简单占位符（如 ``{title}``）时渲染退化为字符串拼接；含属性访问、
+    格式说明等复杂占位符时退回 ``str.format_map``，保持与原有渲染结果一致。
+    """
+
+    def __init__(self, content: str) -> None:
+        self.content = content
+        self._segments: Optional[list[tuple[str, Optional[str]]]] = []
+        for literal, field_name, format_spec, conversion in Formatter().parse(content):
+            simple = field_name is None or (
+                field_name in TEMPLATE_CONTEXT_KEYS and not format_spec and not conversion
+            )
+            if not simple:
+                self._segments = None
+                break
+            self._segments.append((literal, field_name))
+
+    def render(self, context: dict[str, Any]) -> str:
+        if self._segments is None:
+            return self.content.format_map(_SafeTemplateContext(context))
+        parts: list[str] = []
+        for literal, field_name in self._segments:
+            parts.append(literal)
+            if field_name is not None:
+                parts.append(str(context.get(field_name, "")))
+        return "".join(parts)
+
+
 def validate_template_content(content: str) -> List[str]:
     return [placeholder for placeholder in REQUIRED_TEMPLATE_PLACEHOLDERS if placeholder not in content]
 
 
-def render_template_for_task(template: CodeTemplate, task: ChartTask) -> str:
+def compile_template(template: CodeTemplate) -> CompiledTemplate:
+    """按 ``(模板 ID, updated_at)`` 缓存解析结果；模板更新后旧条目自然失效。"""
+    if template.id is None:
+        return CompiledTemplate(template.content)
+    key = (template.id, template.updated_at)
+    compiled = compiled_template_cache.get(key)
+    if compiled is None:
+        compiled = CompiledTemplate(template.content)
+        compiled_template_cache.put(key, compiled)
+    return compiled
+
+
+def invalidate_template(template_id: int) -> None:
+    compiled_template_cache.invalidate(lambda key: key[0] == template_id)
+    rendered_output_cache.invalidate(lambda key: key[3] == template_id)
+
+
+def render_template_for_task(
+    template: CodeTemplate, task: ChartTask, store: bool = True
+) -> str:
+    """渲染任务代码。批量渲染传 ``store=False``：仍可命中缓存，但不写入，避免一次性挤掉常用条目。"""
     result = task.result
     if not result:
         raise ValueError("任务结果尚未准备好，无法渲染模板。")
     if not result.is_success:
         raise ValueError("任务生成失败，无法渲染模板。")
 
-    context = _SafeTemplateContext(
-        title=task.name,
-        summary=(result.summary or "") if result else "",
-        table_data=json.dumps(result.table_data or []),
-        data_points=json.dumps(result.data_points or []),
-        image_url="",
-    )
+    # 任务名称参与渲染，因此以任务 updated_at 与结果版本共同标识输入；
+    # 任一输入变化后旧条目不再被命中，随 LRU 淘汰
+    cache_key = (task.id, task.updated_at, result.version, template.id, template.updated_at)
+    cacheable = task.id is not None and template.id is not None
+    if cacheable:
+        cached = rendered_output_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+    context = {
+        "title": task.name,
+        "summary": (result.summary or "") if result else "",
+        "table_data": json.dumps(result.table_data or []),
+        "data_points": json.dumps(result.data_points or []),
+        "image_url": "",
+    }
     try:
-        return template.content.format_map(context)
+        rendered = compile_template(template).render(context)
     except KeyError as exc:  # pragma: no cover - defensive
         raise ValueError(f"Template is missing placeholder: {exc}") from exc
+
+    if cacheable and store:
+        rendered_output_cache.put(cache_key, rendered)
+    return rendered
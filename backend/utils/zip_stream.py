@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+import io
+import zipfile
+from pathlib import Path
+from typing import Iterable, Iterator, Union
+
+ZIP_READ_CHUNK_SIZE = 64 * 1024
+# 这些格式本身已压缩，再次 deflate 只会浪费 CPU
+_STORED_SUFFIXES = {".png", ".jpg", ".jpeg", ".gif", ".webp", ".zip"}
+
+ZipEntrySource = Union[bytes, str, Path]
+
+
+class _ChunkSink(io.RawIOBase):
+    """不可寻址的写入端：``zipfile`` 会改用数据描述符，写出的字节随时可以取走。"""
+
+    def __init__(self) -> None:
+        self._chunks: list[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def stream_zip(entries: Iterable[tuple[str, ZipEntrySource]]) -> Iterator[bytes]:
+    """边生成边输出 zip 数据，内存占用与归档总大小无关。
+
+    ``entries`` 产出 ``(归档内路径, 内容)``，内容为 ``bytes`` / ``str`` 或磁盘文件路径；
+    文件按块读取写入，每写完一块就把已产生的字节交给调用方。
+    """
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for arcname, source in entries:
+            if isinstance(source, Path):
+                info = zipfile.ZipInfo.from_file(source, arcname)
+                if source.suffix.lower() in _STORED_SUFFIXES:
+                    info.compress_type = zipfile.ZIP_STORED
+                else:
+                    info.compress_type = zipfile.ZIP_DEFLATED
+                with source.open("rb") as reader, archive.open(info, "w") as writer:
+                    for chunk in iter(lambda: reader.read(ZIP_READ_CHUNK_SIZE), b""):
+                        writer.write(chunk)
+                        data = sink.drain()
+                        if data:
+                            yield data
+            else:
+                if isinstance(source, str):
+                    source = source.encode("utf-8")
+                archive.writestr(arcname, source)
+            data = sink.drain()
+            if data:
+                yield data
+    yield sink.drain()